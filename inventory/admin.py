@@ -1,8 +1,10 @@
 from django.contrib import admin
+from .forms import CategoryForm
 from .models import Category
 
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'parent')
+    form = CategoryForm
+    list_display = ('name', 'parent', 'reorder_point', 'par_level', 'reorder_qty')
     search_fields = ('name',)
     list_filter = ('parent',)
 
@@ -0,0 +1,400 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
+from django.db import transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .batch import create_items, update_items
+from .category_tree import get_tree
+from .models import LOW_STOCK, AuditLog, Category, InventoryItem
+from .pagination import InvalidCursor, paginate
+from .stock import NegativeStock, apply_counts, apply_deltas
+
+
+QUANTITY_VALIDATORS = [MinValueValidator(0)]
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.errors = errors
+
+    def response(self):
+        body = {'error': self.message}
+        if self.errors:
+            body['errors'] = self.errors
+        response = JsonResponse(body, status=self.status)
+        if self.status == 401:
+            response['WWW-Authenticate'] = 'Basic realm="inventory"'
+        return response
+
+
+class CsrfCheck(CsrfViewMiddleware):
+    # Hands back the rejection reason instead of rendering the 403 page
+    def _reject(self, request, reason):
+        return reason
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ApiView(View):
+    """
+    Base for the /api/ endpoints: JSON errors instead of login redirects, and
+    HTTP Basic auth for scanners and POS clients next to the browser session.
+    Session-authenticated writes still have to pass the CSRF check.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            self.authenticate(request)
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as error:
+            return error.response()
+
+    def authenticate(self, request):
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if header.startswith('Basic '):
+            request.user = self.basic_user(request, header)
+            return
+        if not request.user.is_authenticated:
+            raise ApiError('Authentication required', status=401)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            reason = CsrfCheck(lambda request: None).process_view(request, None, (), {})
+            if reason:
+                raise ApiError(f'CSRF check failed: {reason}', status=403)
+
+    def basic_user(self, request, header):
+        # A password hash per request would cost more than the API call itself, so a
+        # successful check is remembered for API_AUTH_CACHE_SECONDS, keyed by an HMAC of
+        # the header and tied to the stored password hash (a password change ends it)
+        key = 'inventory:api-auth:' + salted_hmac('inventory.api.basic', header).hexdigest()
+        remembered = cache.get(key)
+        if remembered is not None:
+            user_id, password_mac = remembered
+            user = User.objects.filter(pk=user_id, is_active=True).first()
+            if user is not None and constant_time_compare(password_mac, self.password_mac(user)):
+                return user
+        try:
+            username, _, password = base64.b64decode(header[6:], validate=True).decode().partition(':')
+        except (binascii.Error, UnicodeDecodeError):
+            raise ApiError('Malformed Authorization header', status=401)
+        user = authenticate(request, username=username, password=password)
+        if user is None:
+            raise ApiError('Invalid credentials', status=401)
+        cache.set(key, (user.pk, self.password_mac(user)), settings.API_AUTH_CACHE_SECONDS)
+        return user
+
+    @staticmethod
+    def password_mac(user):
+        return salted_hmac('inventory.api.password', user.password).hexdigest()
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        raise ApiError(f'Method {request.method} not allowed', status=405)
+
+
+class ResourceView(ApiView):
+    """
+    Keyset-paginated listing serialized straight from ``values()`` rows.
+
+    ``fields`` maps output names to lookups, ``default_fields`` is what is
+    returned without ``?fields=``, and ``sort_keys`` lists the keyset columns
+    per ``?sort=`` option (the last one unique).
+    """
+    fields = {}
+    default_fields = ()
+    sort_keys = {}
+    default_sort = 'id'
+
+    def get_queryset(self, request):
+        raise NotImplementedError
+
+    def get_fields(self, request):
+        requested = request.GET.get('fields')
+        if not requested:
+            return list(self.default_fields)
+        fields = [field.strip() for field in requested.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in self.fields]
+        if unknown or not fields:
+            raise ApiError(f'Unknown fields: {", ".join(unknown)}; available: {", ".join(self.fields)}')
+        return fields
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+        except ValueError:
+            raise ApiError('limit must be an integer')
+        return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+    def values(self, queryset, names):
+        # Lookups named like the output go in as-is, the rest as F() aliases
+        plain = [name for name in names if self.fields.get(name, name) == name]
+        aliased = {name: F(self.fields[name]) for name in names if self.fields.get(name, name) != name}
+        return queryset.values(*plain, **aliased)
+
+    def get(self, request):
+        fields = self.get_fields(request)
+        sort = request.GET.get('sort', self.default_sort)
+        if sort not in self.sort_keys:
+            raise ApiError(f'sort must be one of {", ".join(self.sort_keys)}')
+        keys = self.sort_keys[sort]
+        rows = self.values(self.get_queryset(request), fields + [key for key in keys if key not in fields])
+        try:
+            page = paginate(rows, keys, self.get_limit(request),
+                            after=request.GET.get('after'), before=request.GET.get('before'))
+        except InvalidCursor:
+            raise ApiError('Invalid cursor')
+        return JsonResponse({
+            'results': [{field: row[field] for field in fields} for row in page.items],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
+
+
+def int_param(request, name):
+    value = request.GET.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(f'{name} must be an integer')
+
+
+class ItemFields:
+    fields = {
+        'id': 'id',
+        'name': 'name',
+        'quantity': 'quantity',
+        'category': 'category',
+        'category_name': 'category__name',
+        'date_created': 'date_created',
+    }
+    default_fields = ('id', 'name', 'quantity', 'category')
+
+
+class ItemList(ItemFields, ResourceView):
+    # ?category=<id> includes subcategories, ?low=1 keeps low-stock items only
+    sort_keys = {
+        'id': ['id'],
+        'name': ['name', 'id'],
+        'quantity': ['quantity', 'id'],
+        'category': ['category', 'id'],
+    }
+
+    def get_queryset(self, request):
+        items = InventoryItem.objects.filter(user=request.user)
+        category_id = int_param(request, 'category')
+        if category_id is not None:
+            items = items.filter(category__ancestor_links__ancestor_id=category_id)
+        if request.GET.get('low') in ('1', 'true'):
+            items = items.filter(LOW_STOCK)
+        return items
+
+
+class ItemDetail(ItemFields, ResourceView):
+    def get(self, request, item_id):
+        rows = self.values(InventoryItem.objects.filter(user=request.user, pk=item_id), self.get_fields(request))
+        row = rows.first()
+        if row is None:
+            raise ApiError('Item not found', status=404)
+        return JsonResponse(row)
+
+
+class CategoryList(ResourceView):
+    fields = {'id': 'id', 'name': 'name', 'parent': 'parent'}
+    default_fields = ('id', 'name', 'parent')
+    sort_keys = {'id': ['id'], 'name': ['name', 'id']}
+
+    def get_queryset(self, request):
+        categories = Category.objects.all()
+        if 'parent' in request.GET:
+            parent_id = int_param(request, 'parent')
+            categories = categories.filter(parent_id=parent_id) if parent_id else categories.filter(parent__isnull=True)
+        return categories
+
+
+class AuditLogList(ResourceView):
+    fields = {name: name for name in ('id', 'timestamp', 'action', 'item_id', 'item_name', 'category_name', 'changes')}
+    default_fields = tuple(fields)
+    sort_keys = {'timestamp': ['timestamp', 'id']}
+    default_sort = 'timestamp'
+
+    def get_queryset(self, request):
+        logs = AuditLog.objects.filter(user_id=request.user.pk)
+        item_id = int_param(request, 'item')
+        if item_id is not None:
+            logs = logs.filter(item_id=item_id)
+        if request.GET.get('action'):
+            logs = logs.filter(action=request.GET['action'].upper())
+        return logs
+
+
+class BatchValidator:
+    """
+    Checks a batch payload and collects every problem as
+    ``{'section', 'index', 'error'}`` so a client can fix them all at once.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.errors = []
+        self.tree = get_tree()
+        self.name_length = InventoryItem._meta.get_field('name').max_length
+
+    def fail(self, section, index, message):
+        self.errors.append({'section': section, 'index': index, 'error': message})
+
+    def name(self, section, index, value):
+        if not isinstance(value, str) or not value.strip() or len(value.strip()) > self.name_length:
+            self.fail(section, index, f'name must be a non-empty string of at most {self.name_length} characters')
+            return None
+        return value.strip()
+
+    def integer(self, section, index, entry, key, validators=()):
+        value = entry.get(key)
+        if isinstance(value, bool) or not isinstance(value, int):
+            self.fail(section, index, f'{key} must be an integer')
+            return None
+        try:
+            for validator in validators:
+                validator(value)
+        except ValidationError as error:
+            self.fail(section, index, f'{key}: {error.messages[0]}')
+            return None
+        return value
+
+    def quantity(self, section, index, entry):
+        # Same check and message as InventoryItemForm
+        return self.integer(section, index, entry, 'quantity', QUANTITY_VALIDATORS)
+
+    def category(self, section, index, value):
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, int) or self.tree.get(value) is None:
+            self.fail(section, index, f'unknown category {value!r}')
+        return value
+
+    def validate(self, payload):
+        if not isinstance(payload, dict) or set(payload) - {'create', 'update', 'adjust'}:
+            raise ApiError('Expected an object with "create", "update" and/or "adjust" arrays')
+        sections = {key: payload.get(key) or [] for key in ('create', 'update', 'adjust')}
+        if not all(isinstance(entries, list) for entries in sections.values()):
+            raise ApiError('"create", "update" and "adjust" must be arrays')
+        if sum(map(len, sections.values())) > settings.API_MAX_BATCH_SIZE:
+            raise ApiError(f'At most {settings.API_MAX_BATCH_SIZE} operations per batch')
+
+        creates = []
+        for index, entry in enumerate(sections['create']):
+            if not isinstance(entry, dict):
+                self.fail('create', index, 'expected an object')
+                continue
+            creates.append(InventoryItem(
+                name=self.name('create', index, entry.get('name')),
+                quantity=self.quantity('create', index, entry),
+                category_id=self.category('create', index, entry.get('category')),
+                user=self.user,
+            ))
+
+        changes, counts = {}, {}
+        for index, entry in enumerate(sections['update']):
+            item_id = self.item_id('update', index, entry)
+            if item_id is None:
+                continue
+            if item_id in changes or item_id in counts:
+                self.fail('update', index, f'item {item_id} is updated more than once')
+                continue
+            fields = {}
+            if 'name' in entry:
+                fields['name'] = self.name('update', index, entry['name'])
+            if 'category' in entry:
+                fields['category_id'] = self.category('update', index, entry['category'])
+            if 'quantity' in entry:
+                counts[item_id] = self.quantity('update', index, entry)
+            if fields:
+                changes[item_id] = fields
+            elif 'quantity' not in entry:
+                self.fail('update', index, 'nothing to update; give name, category and/or quantity')
+
+        deltas = {}
+        for index, entry in enumerate(sections['adjust']):
+            item_id = self.item_id('adjust', index, entry)
+            delta = self.integer('adjust', index, entry, 'delta') if item_id is not None else None
+            if delta is not None:
+                deltas[item_id] = deltas.get(item_id, 0) + delta
+
+        self.check_ownership(sections, set(changes) | set(counts) | set(deltas))
+        if self.errors:
+            raise ApiError('Invalid batch', errors=self.errors)
+        return creates, changes, counts, deltas
+
+    def item_id(self, section, index, entry):
+        if not isinstance(entry, dict):
+            self.fail(section, index, 'expected an object')
+            return None
+        return self.integer(section, index, entry, 'id')
+
+    def check_ownership(self, sections, item_ids):
+        if not item_ids:
+            return
+        missing = item_ids - set(InventoryItem.objects.filter(user=self.user, pk__in=item_ids).values_list('id', flat=True))
+        for section in ('update', 'adjust'):
+            for index, entry in enumerate(sections[section]):
+                item_id = entry.get('id') if isinstance(entry, dict) else None
+                if isinstance(item_id, int) and item_id in missing:
+                    self.fail(section, index, f'item {item_id} not found')
+
+
+class ItemBatch(ItemFields, ApiView):
+    """
+    POST {"create": [{"name", "quantity", "category"}],
+          "update": [{"id", "name"?, "category"?, "quantity"?}],
+          "adjust": [{"id", "delta"}]}
+
+    The whole batch is validated first and then applied in one transaction
+    with bulk operations: one insert for the creates, one update for the
+    renames/moves, and one each for counted quantities and deltas (ledger,
+    audit and summary rows included). Quantities in "update" are booked as
+    counts. Responds with the new ids in request order plus the touched items.
+    """
+
+    def post(self, request):
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            raise ApiError('Request body must be JSON')
+        creates, changes, counts, deltas = BatchValidator(request.user).validate(payload)
+
+        try:
+            with transaction.atomic():
+                created = create_items(request.user, creates, note='API') if creates else []
+                if changes:
+                    update_items(request.user, changes)
+                if counts:
+                    apply_counts(request.user, counts, note='API')
+                if deltas:
+                    apply_deltas(request.user, deltas, note='API')
+        except NegativeStock as error:
+            # Only known under the row locks; the whole batch is rolled back
+            raise ApiError('Invalid batch', errors=[
+                {'section': 'adjust', 'index': index, 'error': f'quantity would be {error.balances[entry["id"]]}, below 0'}
+                for index, entry in enumerate(payload['adjust']) if entry['id'] in error.balances
+            ])
+
+        created_ids = [item.pk for item in created]
+        touched = set(created_ids) | set(changes) | set(counts) | set(deltas)
+        rows = InventoryItem.objects.filter(pk__in=touched).order_by('id').values(*self.default_fields)
+        return JsonResponse({'created': created_ids, 'items': list(rows)}, status=201 if created else 200)
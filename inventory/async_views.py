@@ -0,0 +1,162 @@
+"""
+Async variants of the read-only views, used instead of the sync ones when
+settings.ASYNC_VIEWS is on (the default under asgi.py). Queries go through
+Django's async ORM; template rendering, which touches the session and
+messages, runs in the sync thread.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import Count, Q, Sum
+from django.http import Http404
+from django.shortcuts import render
+from django.views import View
+
+from .category_tree import get_tree
+from .fragments import acached_fragment
+from .models import LOW_STOCK, Category, InventoryItem, InventorySummary, InventoryVersion
+from .pagination import InvalidCursor, apaginate
+from .reorder import suggested_order
+from .views import Dashboard, inventory_conditions
+
+arender = sync_to_async(render)
+
+
+def async_login_required(view):
+    # LoginRequiredMixin reads request.user synchronously, which the async ORM forbids
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return inner
+
+
+def with_inventory_version(view):
+    # Loads the version stamp up front so the sync ETag/Last-Modified callbacks find it memoized
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        request._inventory_version = await InventoryVersion.acurrent(request.user.pk)
+        return await view(request, *args, **kwargs)
+    return inner
+
+
+class AsyncView(View):
+    # Decorators for the view function as_view() returns, outermost first
+    decorators = [async_login_required]
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        for decorator in reversed(cls.decorators):
+            view = decorator(view)
+        return view
+
+
+class ConditionalView(AsyncView):
+    decorators = [async_login_required, with_inventory_version, *inventory_conditions]
+
+
+class AsyncDashboard(ConditionalView):
+    SORT_KEYS = Dashboard.SORT_KEYS
+    get_page_size = Dashboard.get_page_size
+    page_params = Dashboard.page_params
+    cache_key = Dashboard.cache_key
+    render_page = Dashboard.render_page
+
+    async def get(self, request):
+        params = self.page_params(request)
+        fragment = await acached_fragment(self.cache_key(request, *params), lambda: self.render_rows(request, *params))
+        return await sync_to_async(self.render_page)(request, fragment, *params[:2])
+
+    async def render_rows(self, request, sort_by, page_size, after, before):
+        # The page and the low-stock count are fetched concurrently
+        low_count = asyncio.ensure_future(self.low_count(request.user.pk))
+        items = Dashboard.items(request.user.pk)
+        try:
+            page = await apaginate(items, self.SORT_KEYS[sort_by], page_size, after=after, before=before)
+        except InvalidCursor:
+            page = await apaginate(items, self.SORT_KEYS[sort_by], page_size)
+        return Dashboard.fragment(page, await low_count)
+
+    @staticmethod
+    async def low_count(user_id):
+        return await InventoryItem.objects.filter(LOW_STOCK, user=user_id).acount()
+
+
+class AsyncInventorySummaryReport(ConditionalView):
+    async def get(self, request):
+        # The counter rows, their totals and the category tree are fetched concurrently
+        summaries = InventorySummary.objects.filter(user=request.user, item_count__gt=0)
+        rows, totals, tree = await asyncio.gather(
+            self.rows(summaries),
+            summaries.aaggregate(total_items=Sum('item_count'), total_quantity=Sum('total_quantity')),
+            sync_to_async(get_tree)(),
+        )
+        category_counts = []
+        for row in rows:
+            node = tree.get(row['category_id'])
+            if node is not None:
+                category_counts.append({'id': row['category_id'], 'name': node.name, 'item_count': row['item_count']})
+
+        context = {
+            'total_items': totals['total_items'] or 0,
+            'total_quantity': totals['total_quantity'] or 0,
+            'category_counts': category_counts,
+        }
+        return await arender(request, 'inventory/inventory_summary_report.html', context)
+
+    @staticmethod
+    async def rows(summaries):
+        # values(), not values_list(): the latter's iterator runs its query before aiterator() reaches the sync thread
+        return [row async for row in summaries.values('category_id', 'item_count').aiterator()]
+
+
+class AsyncLowStockReport(ConditionalView):
+    async def get(self, request):
+        low_stock_items = InventoryItem.objects.filter(LOW_STOCK, user=request.user).select_related('category')
+        items, tree = await asyncio.gather(self.items(low_stock_items), sync_to_async(get_tree)())
+        context = {
+            'rows': [(item, suggested_order(item, tree)) for item in items],
+        }
+        return await arender(request, 'inventory/low_stock_report.html', context)
+
+    @staticmethod
+    async def items(low_stock_items):
+        return [item async for item in low_stock_items.aiterator()]
+
+
+class AsyncItemsByCategoryView(AsyncView):
+    async def get(self, request, category_id):
+        try:
+            category = await Category.objects.aget(id=category_id)
+        except Category.DoesNotExist:
+            raise Http404('No Category matches the given query.')
+
+        # Items below the category and the per-subcategory rollups, fetched concurrently
+        items = InventoryItem.objects.filter(
+            category__ancestor_links__ancestor=category, user=request.user
+        ).select_related('category').order_by('name')
+        user_items = Q(descendant_links__descendant__inventoryitem__user=request.user)
+        subcategories = Category.objects.filter(parent=category).annotate(
+            item_count=Count('descendant_links__descendant__inventoryitem', filter=user_items),
+            total_quantity=Sum('descendant_links__descendant__inventoryitem__quantity', filter=user_items),
+        ).order_by('name')
+        items, subcategories = await asyncio.gather(
+            self.fetch(items), self.fetch(subcategories)
+        )
+
+        context = {
+            'category': category,
+            'items': items,
+            'subcategories': subcategories,
+        }
+        return await arender(request, 'inventory/items_by_category.html', context)
+
+    @staticmethod
+    async def fetch(queryset):
+        return [row async for row in queryset.aiterator()]
@@ -0,0 +1,232 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import locks
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import metrics
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+def write_entries(entries):
+    """Insert audit entries with one bulk_create, falling back to row-by-row on integrity errors."""
+    started = time.perf_counter()
+    try:
+        with transaction.atomic():
+            AuditLog.objects.bulk_create([AuditLog(**entry) for entry in entries])
+    except IntegrityError:
+        for entry in entries:
+            try:
+                with transaction.atomic():
+                    AuditLog.objects.create(**entry)
+            except IntegrityError:
+                logger.exception('Dropping audit entry %r', entry)
+    metrics.record_audit_write(entries, time.perf_counter() - started)
+
+
+class AuditBuffer:
+    """
+    Process-local buffer of pending AuditLog rows.
+
+    Every entry is appended to a per-process spool file before it is buffered,
+    so a crash between buffering and flushing can be recovered with
+    ``manage.py flush_audit_spool``. The process holds a lock on its spool
+    file while it is open and removes the file once everything is flushed.
+    """
+
+    def __init__(self, batch_size, flush_interval, spool_dir):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = Path(spool_dir) / f'{os.getpid()}.jsonl'
+        self._entries = []
+        self._oldest = None
+        self._timer = None
+        self._spool = None
+        self._lock = threading.RLock()
+
+    def add(self, entries):
+        with self._lock:
+            self._write_spool(entries)
+            self._entries.extend(entries)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = (len(self._entries) >= self.batch_size
+                   or time.monotonic() - self._oldest >= self.flush_interval)
+            if due:
+                self._try_flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            entries, self._entries, self._oldest = self._entries, [], None
+            if not entries:
+                return
+            try:
+                write_entries(entries)
+            except Exception:
+                # Keep the entries (they are still in the spool) for the next flush
+                self._entries[:0] = entries
+                self._oldest = time.monotonic()
+                raise
+            if self._spool is not None:
+                self._spool.seek(0)
+                self._spool.truncate()
+                self._spool.close()
+                self._spool = None
+                _remove(self.spool_path)
+
+    def _try_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Audit flush failed; entries remain in %s', self.spool_path)
+
+    def _flush_from_timer(self):
+        close_old_connections()
+        try:
+            self._try_flush()
+        finally:
+            close_old_connections()
+
+    def _write_spool(self, entries):
+        if self._spool is None:
+            self._spool = self._open_spool()
+        for entry in entries:
+            self._spool.write(json.dumps(entry, cls=DjangoJSONEncoder) + '\n')
+        self._spool.flush()
+        os.fsync(self._spool.fileno())
+
+    def _open_spool(self):
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            spool = open(self.spool_path, 'a', encoding='utf-8')
+            locks.lock(spool, locks.LOCK_EX)
+            if _is_current(spool, self.spool_path):
+                return spool
+            spool.close()
+
+
+def _is_current(spool, path):
+    # Between open() and getting the lock the file may have been replayed and removed
+    try:
+        return os.fstat(spool.fileno()).st_ino == os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _remove(path):
+    # Only once the file is closed and unlocked (Windows cannot remove open
+    # files). It is already empty, so if another process has it open and the
+    # removal fails, a later replay finds nothing to write and removes it then
+    try:
+        path.unlink(missing_ok=True)
+    except OSError:
+        logger.warning('Could not remove empty audit spool %s', path)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = AuditBuffer(
+                batch_size=settings.AUDIT_BATCH_SIZE,
+                flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+                spool_dir=settings.AUDIT_SPOOL_DIR,
+            )
+        return _buffer
+
+
+def flush():
+    if _buffer is not None:
+        _buffer.flush()
+
+
+def _reset_after_fork():
+    # A forked worker must not inherit the parent's entries, timer or spool file
+    global _buffer, _buffer_lock
+    _buffer = None
+    _buffer_lock = threading.Lock()
+
+
+atexit.register(flush)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _enqueue_on_commit(entry):
+    # Entries only reach the buffer once their transaction commits. All entries
+    # written at the same savepoint level share one on_commit callback, so a
+    # committed batch is handed to the buffer in one go.
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        get_buffer().add([entry])
+        return
+
+    savepoint_ids = set(connection.savepoint_ids)
+    for callback_savepoints, callback, _ in connection.run_on_commit:
+        if callback_savepoints == savepoint_ids and hasattr(callback, 'audit_entries'):
+            callback.audit_entries.append(entry)
+            return
+
+    entries = [entry]
+
+    def drain():
+        get_buffer().add(entries)
+
+    drain.audit_entries = entries
+    transaction.on_commit(drain)
+
+
+def record(**fields):
+    """Record one AuditLog entry, synchronously or through the batch buffer per AUDIT_LOG_MODE."""
+    fields.setdefault('timestamp', timezone.now())
+    if settings.AUDIT_LOG_MODE == 'sync':
+        started = time.perf_counter()
+        AuditLog.objects.create(**fields)
+        metrics.record_audit_write([fields], time.perf_counter() - started)
+    else:
+        _enqueue_on_commit(fields)
+
+
+def replay_spool(spool_dir):
+    """
+    Write the entries left in the spool files to the database and remove the
+    files. Files still locked by a running process are skipped.
+    """
+    replayed = 0
+    for path in sorted(Path(spool_dir).glob('*.jsonl')):
+        with open(path, 'r+', encoding='utf-8') as spool:
+            if not locks.lock(spool, locks.LOCK_EX | locks.LOCK_NB) or not _is_current(spool, path):
+                continue
+            entries = [json.loads(line) for line in spool if line.strip()]
+            for entry in entries:
+                entry['timestamp'] = parse_datetime(entry['timestamp'])
+            if entries:
+                write_entries(entries)
+            # Emptied under the lock, so a file that cannot be removed is never replayed twice
+            spool.seek(0)
+            spool.truncate()
+        _remove(path)
+        replayed += len(entries)
+    return replayed
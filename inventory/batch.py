@@ -0,0 +1,111 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import audit, reorder
+from .category_tree import get_tree
+from .models import InventoryItem, InventorySummary, InventoryVersion, StockMovement
+from .signals import quantity_changed
+from .stock import category_name
+
+
+def create_items(user, items, note='', category_names=None):
+    """
+    Insert unsaved InventoryItems for ``user`` with one bulk_create, writing
+    their opening ledger rows, audit entries and summary counters in bulk too
+    (bulk_create sends no signals). ``category_names`` maps category id to name
+    for categories the cached tree may not know yet. Returns the saved items.
+    """
+    names = category_names or {}
+    tree = get_tree()
+    for item in items:
+        item.effective_reorder_point = reorder.effective_reorder_point(item, tree)
+    with transaction.atomic():
+        items = InventoryItem.objects.bulk_create(items)
+
+        now = timezone.now()
+        StockMovement.objects.bulk_create([
+            StockMovement(item_id=item.pk, kind='COUNT', delta=item.quantity, balance=item.quantity,
+                          user_id=user.pk, note=note, timestamp=now)
+            for item in items
+        ])
+        audit.write_entries([
+            {
+                'action': 'CREATE', 'item_id': item.pk, 'item_name': item.name, 'category_id': item.category_id,
+                'category_name': names[item.category_id] if item.category_id in names else category_name(item.category_id),
+                'user_id': user.pk, 'timestamp': now,
+                'changes': {'name': [None, item.name], 'quantity': [None, item.quantity],
+                            'category_id': [None, item.category_id]},
+            }
+            for item in items
+        ])
+        summary_deltas = defaultdict(lambda: [0, 0, 0])
+        for item in items:
+            summary_delta = summary_deltas[item.category_id]
+            summary_delta[0] += 1
+            summary_delta[1] += item.quantity
+            summary_delta[2] += int(item.quantity <= item.effective_reorder_point)
+        for category_id, (item_count, quantity, low_count) in summary_deltas.items():
+            InventorySummary.apply(user.pk, category_id, item_count=item_count, total_quantity=quantity,
+                                   low_stock_count=low_count)
+        if items:
+            InventoryVersion.bump(user.pk)
+            quantity_changed.send(sender=InventoryItem, changes=[
+                {'user_id': user.pk, 'item_id': item.pk, 'name': item.name, 'previous': None, 'quantity': item.quantity,
+                 'reorder_point': item.effective_reorder_point}
+                for item in items
+            ])
+    return items
+
+
+def update_items(user, changes):
+    """
+    Rename and/or recategorise many of ``user``'s items at once. ``changes``
+    maps item id to a dict with ``name`` and/or ``category_id``; quantities go
+    through the ledger instead (``stock.apply_counts``/``apply_deltas``). One
+    bulk_update, one audit insert and one summary update per touched category.
+    Returns the changed items.
+    """
+    tree = get_tree()
+    with transaction.atomic():
+        items = InventoryItem.objects.select_for_update().filter(user=user, pk__in=list(changes)).only(
+            'id', 'name', 'quantity', 'category_id', 'user_id', 'reorder_point', 'effective_reorder_point'
+        )
+        now = timezone.now()
+        changed, entries = [], []
+        summary_deltas = defaultdict(lambda: [0, 0, 0])
+        for item in items:
+            for field, value in changes[item.pk].items():
+                setattr(item, field, value)
+            diff = {field: values for field, values in item.changed_fields().items() if field != 'quantity'}
+            if not diff:
+                continue
+            if 'category_id' in diff:
+                old_category_id, new_category_id = diff['category_id']
+                old_point = item.effective_reorder_point
+                # The new category may hand down a different reorder point
+                item.effective_reorder_point = reorder.effective_reorder_point(item, tree)
+                for category_id, sign, point in ((old_category_id, -1, old_point),
+                                                 (new_category_id, 1, item.effective_reorder_point)):
+                    summary_delta = summary_deltas[category_id]
+                    summary_delta[0] += sign
+                    summary_delta[1] += sign * item.quantity
+                    summary_delta[2] += sign * int(item.quantity <= point)
+            entries.append({
+                'action': 'UPDATE', 'changes': diff, 'item_id': item.pk, 'item_name': item.name,
+                'category_id': item.category_id, 'category_name': category_name(item.category_id),
+                'user_id': item.user_id, 'timestamp': now,
+            })
+            changed.append(item)
+
+        if changed:
+            InventoryItem.objects.bulk_update(changed, ['name', 'category_id', 'effective_reorder_point'], batch_size=500)
+            audit.write_entries(entries)
+            for category_id, (item_count, quantity, low_count) in summary_deltas.items():
+                InventorySummary.apply(user.pk, category_id, item_count=item_count, total_quantity=quantity,
+                                       low_stock_count=low_count)
+            InventoryVersion.bump(user.pk)
+        for item in changed:
+            item.remember_state()
+    return changed
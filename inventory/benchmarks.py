@@ -0,0 +1,167 @@
+"""
+View benchmarks for comparing commits: each scenario is requested through
+the test client against the configured database (fill it with
+``manage.py generate_inventory_data``) and timed together with its query
+count, DB time, template render time and peak Python memory.
+"""
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .fragments import fragment_cache
+from .instrumentation import QueryTimer, RenderTimer
+from .models import AuditLog, Category, InventoryItem
+from .views import Dashboard
+
+# Measurements compared against a baseline, with the smallest change worth reporting
+COMPARED = {'median_ms': 2.0, 'db_ms': 1.0, 'render_ms': 1.0, 'peak_kib': 64}
+
+
+class Scenario:
+    """
+    One request to benchmark. ``cold`` clears the dashboard fragment cache
+    before every request; ``rollback`` runs it in a transaction that is
+    rolled back, so writes can be repeated against the same rows.
+    """
+
+    def __init__(self, name, path, data=None, cold=True, rollback=False):
+        self.name = name
+        self.path = path
+        self.data = data
+        self.cold = cold
+        self.rollback = rollback
+
+    def request(self, client):
+        if self.cold:
+            fragment_cache().clear()
+        with rolled_back() if self.rollback else nullcontext():
+            if self.data is None:
+                return client.get(self.path)
+            return client.post(self.path, self.data)
+
+
+@contextmanager
+def rolled_back():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def scenarios(user):
+    dashboard = reverse('dashboard')
+    result = [Scenario(f'dashboard-{sort_by}', f'{dashboard}?sort={sort_by}') for sort_by in Dashboard.SORT_KEYS]
+    result.append(Scenario('dashboard-cached', dashboard, cold=False))
+    result.append(Scenario('inventory-summary', reverse('inventory-summary')))
+    result.append(Scenario('low-stock', reverse('low-stock')))
+
+    # The root category holding most of the user's items
+    category = Category.objects.filter(parent=None).annotate(
+        item_count=Count('descendant_links__descendant__inventoryitem',
+                         filter=Q(descendant_links__descendant__inventoryitem__user=user))
+    ).order_by('-item_count', 'id').first()
+    if category is not None:
+        result.append(Scenario('items-by-category', reverse('items-by-category', args=[category.pk])))
+
+    item = InventoryItem.objects.filter(user=user, category__isnull=False).order_by('id').first()
+    if item is not None:
+        edit = {'name': item.name, 'quantity': item.quantity + 1, 'original_quantity': item.quantity,
+                'category': item.category_id}
+        result.append(Scenario('edit-item', reverse('edit-item', args=[item.pk]), data=edit, rollback=True))
+        result.append(Scenario('delete-item', reverse('delete-item', args=[item.pk]), data={}, rollback=True))
+    return result
+
+
+def measure(client, scenario):
+    with QueryTimer() as queries, RenderTimer() as renders:
+        started = time.perf_counter()
+        response = scenario.request(client)
+        elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(f'{scenario.name}: {scenario.path} answered {response.status_code}')
+    return elapsed * 1000, queries, renders
+
+
+def peak_memory(client, scenario):
+    # A separate request, since tracing allocations slows everything down
+    tracemalloc.start()
+    try:
+        scenario.request(client)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run(user, repeat=20, warmup=3, names=None):
+    """Benchmark every scenario (or those in ``names``) for ``user``; returns results keyed by scenario."""
+    client = Client()
+    client.force_login(user)
+    results = {}
+    # DEBUG would log every query in connection.queries
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+        for scenario in scenarios(user):
+            if names and scenario.name not in names:
+                continue
+            for _ in range(warmup):
+                scenario.request(client)
+            samples = [measure(client, scenario) for _ in range(repeat)]
+            timings = sorted(elapsed for elapsed, _, _ in samples)
+            results[scenario.name] = {
+                'requests': repeat,
+                'median_ms': statistics.median(timings),
+                'p95_ms': timings[min(len(timings) - 1, round(0.95 * (len(timings) - 1)))],
+                'queries': max(queries.count for _, queries, _ in samples),
+                'db_ms': statistics.median(queries.duration_ms for _, queries, _ in samples),
+                'render_ms': statistics.median(renders.duration_ms for _, _, renders in samples),
+                'peak_kib': peak_memory(client, scenario),
+            }
+    return results
+
+
+def metadata(user):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=settings.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'async_views': settings.ASYNC_VIEWS,
+        'user': user.username,
+        'items': InventoryItem.objects.filter(user=user).count(),
+        'categories': Category.objects.count(),
+        'audit_rows': AuditLog.objects.filter(user_id=user.pk).count(),
+    }
+
+
+def compare(baseline, results, tolerance=0.5):
+    """
+    Regressions of ``results`` against ``baseline`` (both keyed by scenario):
+    any extra query, or a measurement more than ``tolerance`` (a fraction)
+    and more than its COMPARED floor above the baseline.
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current['queries'] > before['queries']:
+            regressions.append(f'{name}: {before["queries"]} -> {current["queries"]} queries')
+        for key, floor in COMPARED.items():
+            if current[key] > before[key] * (1 + tolerance) and current[key] - before[key] > floor:
+                regressions.append(f'{name}: {key} {before[key]:.1f} -> {current[key]:.1f}')
+    return regressions
@@ -0,0 +1,174 @@
+"""
+Per-request budgets. RequestBudgetMiddleware counts the SQL queries, DB time
+and template render time of every request to a URL name listed in
+settings.REQUEST_BUDGETS and reports the requests that go over: they are
+logged with the stack of every query past the budget, or raised as
+BudgetExceeded when settings.REQUEST_BUDGETS_RAISE is on, which
+BudgetTestRunner does so violations fail the test suite.
+"""
+import logging
+import tempfile
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.dispatch import Signal
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .instrumentation import ProfilingMiddleware, QueryTimer, RenderTimer, url_match
+
+logger = logging.getLogger(__name__)
+
+BUDGET_KEYS = {'queries', 'db_ms', 'render_ms'}
+
+# Sent after every budgeted request with its RequestProfile and list of violations
+request_profiled = Signal()
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def project_stack():
+    # Only this project's frames, innermost last; the SQL shows what the library code was doing
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base) and 'site-packages' not in frame.filename and frame.filename != __file__
+    ]
+    return ''.join(traceback.format_list(frames))
+
+
+class RequestProfile(QueryTimer):
+    """
+    QueryTimer that also times template renders and keeps the SQL and stack
+    of every query past ``max_queries``.
+    """
+
+    def __init__(self, url_name, max_queries=None):
+        super().__init__()
+        self.url_name = url_name
+        self.max_queries = max_queries
+        self.renders = RenderTimer()
+        self.overflow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.max_queries is not None and self.count >= self.max_queries:
+            self.overflow.append((sql, project_stack()))
+        return super().__call__(execute, sql, params, many, context)
+
+    def __enter__(self):
+        self.renders.__enter__()
+        return super().__enter__()
+
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            self.renders.__exit__(*exc_info)
+
+    async def __aenter__(self):
+        self.renders.__enter__()
+        return await super().__aenter__()
+
+    async def __aexit__(self, *exc_info):
+        try:
+            return await super().__aexit__(*exc_info)
+        finally:
+            self.renders.__exit__(*exc_info)
+
+    def measured(self):
+        return {'queries': self.count, 'db_ms': self.duration_ms, 'render_ms': self.renders.duration_ms}
+
+    def violations(self, budget):
+        measured = self.measured()
+        return [f'{key} {measured[key]:.4g} > {limit}' for key, limit in budget.items() if measured[key] > limit]
+
+
+class RequestBudgetMiddleware(ProfilingMiddleware):
+    def __init__(self, get_response):
+        self.budgets = getattr(settings, 'REQUEST_BUDGETS', None)
+        if not self.budgets:
+            raise MiddlewareNotUsed
+        for url_name, budget in self.budgets.items():
+            if set(budget) - BUDGET_KEYS:
+                raise ImproperlyConfigured(
+                    f'REQUEST_BUDGETS[{url_name!r}] may only set {", ".join(sorted(BUDGET_KEYS))}'
+                )
+        super().__init__(get_response)
+
+    def profile(self, request):
+        # Resolved before the view runs, so the stacks of queries past the budget can be kept
+        match = url_match(request)
+        budget = self.budgets.get(match.url_name) if match else None
+        if budget is None:
+            return None
+        return RequestProfile(match.url_name, budget.get('queries'))
+
+    def finish(self, request, response, profile):
+        self.check(request, profile, self.budgets[profile.url_name])
+        return response
+
+    def check(self, request, profile, budget):
+        violations = profile.violations(budget)
+        request_profiled.send(sender=self.__class__, request=request, profile=profile, violations=violations)
+        if not violations:
+            return
+        message = f'{request.method} {request.path} ({profile.url_name}) over budget: {", ".join(violations)}'
+        details = ''.join(f'\n\nQuery past the budget: {sql}\n{stack}' for sql, stack in profile.overflow)
+        if settings.REQUEST_BUDGETS_RAISE:
+            raise BudgetExceeded(message + details)
+        logger.warning('%s%s', message, details)
+
+
+@contextmanager
+def profile_requests():
+    """
+    Test helper collecting the RequestProfile of every budgeted request made
+    inside the block, e.g. to check a view's query count does not grow with
+    the data.
+    """
+    profiles = []
+
+    def collect(profile, **kwargs):
+        profiles.append(profile)
+
+    request_profiled.connect(collect, dispatch_uid=id(profiles))
+    try:
+        yield profiles
+    finally:
+        request_profiled.disconnect(dispatch_uid=id(profiles))
+
+
+class BudgetTestRunner(DiscoverRunner):
+    """
+    Test runner that fails every request over its budget instead of logging it.
+    Audit entries are spooled, and the default cache kept, in a temporary
+    directory rather than AUDIT_SPOOL_DIR and the project's cache.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.REQUEST_BUDGETS_RAISE = True
+        self.scratch = tempfile.TemporaryDirectory(prefix='inventory-tests-')
+        settings.AUDIT_SPOOL_DIR = Path(self.scratch.name) / 'audit_spool'
+        self.cache_settings = override_settings(CACHES={
+            **settings.CACHES,
+            'default': {**settings.CACHES['default'], 'LOCATION': Path(self.scratch.name) / 'cache'},
+        })
+        self.cache_settings.enable()
+
+    def teardown_databases(self, old_config, **kwargs):
+        from . import audit
+
+        # Pending entries go to the test database, not to the real one at exit
+        audit.flush()
+        super().teardown_databases(old_config, **kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        self.scratch.cleanup()
+        super().teardown_test_environment(**kwargs)
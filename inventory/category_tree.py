@@ -0,0 +1,111 @@
+import time
+
+from django.core.cache import cache
+
+from .models import Category
+
+VERSION_KEY = 'inventory:category-tree-version'
+PATH_SEPARATOR = ' › '
+LEVEL_FIELDS = ('reorder_point', 'par_level', 'reorder_qty')
+
+
+class CategoryNode:
+    # The level fields hold the category's own value, or the nearest ancestor's
+    __slots__ = ('id', 'name', 'parent_id', 'children', 'path', 'depth') + LEVEL_FIELDS
+
+    def __init__(self, id, name, parent_id, reorder_point=None, par_level=None, reorder_qty=None):
+        self.id = id
+        self.name = name
+        self.parent_id = parent_id
+        self.children = []
+        self.path = name
+        self.depth = 0
+        self.reorder_point = reorder_point
+        self.par_level = par_level
+        self.reorder_qty = reorder_qty
+
+    def as_category(self):
+        # A Category built from the cache, usable as a FK value without a query
+        category = Category(id=self.id, name=self.name, parent_id=self.parent_id)
+        category._state.adding = False
+        category._state.db = 'default'
+        return category
+
+
+class CategoryTree:
+    """Immutable snapshot of every category with children lists and display paths."""
+
+    def __init__(self, rows):
+        self.nodes = {row[0]: CategoryNode(*row) for row in rows}
+        self.roots = []
+        for node in sorted(self.nodes.values(), key=lambda node: node.name):
+            parent = self.nodes.get(node.parent_id)
+            if parent is None:
+                self.roots.append(node)
+            else:
+                parent.children.append(node)
+
+        # Depth-first order, so every node follows its parent in dropdowns
+        self.ordered = []
+        stack = list(reversed(self.roots))
+        while stack:
+            node = stack.pop()
+            parent = self.nodes.get(node.parent_id)
+            if parent is not None:
+                node.path = parent.path + PATH_SEPARATOR + node.name
+                node.depth = parent.depth + 1
+                for field in LEVEL_FIELDS:
+                    if getattr(node, field) is None:
+                        setattr(node, field, getattr(parent, field))
+            self.ordered.append(node)
+            stack.extend(reversed(node.children))
+
+        self._choices = [(node.id, node.path) for node in self.ordered]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, id):
+        return self.nodes.get(id)
+
+    def choices(self):
+        return self._choices
+
+    def subtree_ids(self, id):
+        ids = []
+        stack = [self.nodes[id]] if id in self.nodes else []
+        while stack:
+            node = stack.pop()
+            ids.append(node.id)
+            stack.extend(node.children)
+        return ids
+
+
+_tree = None
+_tree_version = None
+
+
+def get_tree():
+    """
+    Return the cached CategoryTree, rebuilding it when the shared version key
+    has moved on (another process, or this one, changed a category).
+    """
+    global _tree, _tree_version
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    if _tree is None or version != _tree_version:
+        _tree = CategoryTree(Category.objects.values_list('id', 'name', 'parent_id', *LEVEL_FIELDS))
+        _tree_version = version
+    return _tree
+
+
+def invalidate():
+    global _tree
+    _tree = None
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Key expired or was evicted; any fresh value differs from the cached ones
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
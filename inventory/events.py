@@ -0,0 +1,119 @@
+import asyncio
+import itertools
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+
+class Subscription:
+    """One SSE client: an asyncio queue on the loop that serves it."""
+
+    def __init__(self, broker, user_id, maxsize):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, event):
+        # Runs on self.loop; a client that stops reading loses its oldest events, not memory
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """
+    In-process pub/sub between the item signals and the SSE streams. Publishing
+    is thread-safe (signals fire in request threads); delivery is scheduled on
+    each subscriber's event loop, so idle clients hold no thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._ids = itertools.count(1)
+
+    def subscribe(self, user_id, maxsize=None):
+        subscription = Subscription(self, user_id, maxsize or settings.EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(map(len, self._subscribers.values()))
+
+    def publish(self, user_id, kind, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        if not subscribers:
+            return
+        event = (next(self._ids), kind, data)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Loop already closed (server shutting down)
+                self.unsubscribe(subscription)
+
+
+broker = Broker()
+
+
+def publish_changes(changes):
+    """
+    Turn quantity changes ({'user_id', 'item_id', 'name', 'previous', 'quantity',
+    'reorder_point'}, previous None for new items) into 'quantity' events, plus
+    a 'low_stock' event whenever an item crosses its reorder point.
+    """
+    for change in changes:
+        data = {key: change[key] for key in ('item_id', 'name', 'previous', 'quantity')}
+        broker.publish(change['user_id'], 'quantity', data)
+        point = change['reorder_point']
+        was_low = change['previous'] is not None and change['previous'] <= point
+        is_low = change['quantity'] <= point
+        if was_low != is_low:
+            broker.publish(change['user_id'], 'low_stock', dict(data, low=is_low, reorder_point=point))
+
+
+def available(request):
+    """
+    Whether ``request`` can hold an event stream: only async views under ASGI
+    wait on the event loop. Under WSGI the stream would pin a worker thread
+    (and its buffered output) for as long as the page stays open.
+    """
+    return settings.ASYNC_VIEWS and isinstance(request, ASGIRequest)
+
+
+def format_event(event_id, kind, data):
+    return f'id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+async def stream(user_id):
+    """SSE body for one client: events for ``user_id`` plus a comment line as keepalive."""
+    with broker.subscribe(user_id) as subscription:
+        yield f'retry: {settings.EVENTS_RETRY_MS}\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(*event)
@@ -0,0 +1,73 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .category_tree import get_tree
+from .models import AuditLog, CategoryClosure, InventoryItem
+
+ITEM_COLUMNS = ['id', 'name', 'quantity', 'category', 'date_created']
+AUDIT_COLUMNS = ['id', 'timestamp', 'action', 'item_id', 'item_name', 'category_name', 'changes']
+
+
+def day_bounds(date_from=None, date_to=None):
+    """Aware datetimes for [start of date_from, start of the day after date_to)."""
+    tz = timezone.get_current_timezone()
+    start = datetime.combine(date_from, time.min, tzinfo=tz) if date_from else None
+    end = datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=tz) if date_to else None
+    return start, end
+
+
+def item_rows(user, category_id=None, date_from=None, date_to=None):
+    items = InventoryItem.objects.filter(user=user)
+    if category_id is not None:
+        items = items.filter(category__ancestor_links__ancestor_id=category_id)
+    start, end = day_bounds(date_from, date_to)
+    if start:
+        items = items.filter(date_created__gte=start)
+    if end:
+        items = items.filter(date_created__lt=end)
+
+    tree = get_tree()
+    rows = items.order_by('id').values_list('id', 'name', 'quantity', 'category_id', 'date_created')
+    for id, name, quantity, item_category_id, date_created in rows.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        node = tree.get(item_category_id)
+        yield [id, name, quantity, node.path if node else '', date_created]
+
+
+def audit_rows(user, category_id=None, date_from=None, date_to=None):
+    logs = AuditLog.objects.filter(user_id=user.pk)
+    if category_id is not None:
+        # By the snapshotted category id, since names are not unique
+        subtree = CategoryClosure.objects.filter(ancestor_id=category_id).values('descendant_id')
+        logs = logs.filter(category_id__in=subtree)
+    start, end = day_bounds(date_from, date_to)
+    if start:
+        logs = logs.filter(timestamp__gte=start)
+    if end:
+        logs = logs.filter(timestamp__lt=end)
+
+    rows = logs.order_by('timestamp', 'id').values_list(*AUDIT_COLUMNS)
+    for row in rows.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield list(row)
+
+
+class Echo:
+    # csv.writer target that hands each formatted line back instead of buffering it
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([json.dumps(value) if isinstance(value, (dict, list)) else value for value in row])
+
+
+def stream_jsonl(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
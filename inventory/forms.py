@@ -1,8 +1,47 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
+from django.forms.models import ModelChoiceIterator
+from .category_tree import get_tree
 from .models import Category, InventoryItem
 
+
+class CategoryChoiceIterator(ModelChoiceIterator):
+	# Choices come from the cached category tree, labelled with their full path
+	def __iter__(self):
+		if self.field.empty_label is not None:
+			yield ('', self.field.empty_label)
+		yield from get_tree().choices()
+
+	def __len__(self):
+		return len(get_tree()) + (self.field.empty_label is not None)
+
+	def __bool__(self):
+		return self.field.empty_label is not None or len(get_tree()) > 0
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+	iterator = CategoryChoiceIterator
+
+	def __init__(self, **kwargs):
+		super().__init__(queryset=Category.objects.all(), **kwargs)
+
+	def to_python(self, value):
+		if value in self.empty_values:
+			return None
+		try:
+			node = get_tree().get(int(value))
+		except (TypeError, ValueError):
+			node = None
+		if node is None:
+			raise forms.ValidationError(
+				self.error_messages['invalid_choice'],
+				code='invalid_choice',
+				params={'value': value},
+			)
+		return node.as_category()
+
+
 class UserRegisterForm(UserCreationForm):
 	email = forms.EmailField()
 
@@ -11,17 +50,35 @@ class UserRegisterForm(UserCreationForm):
 		fields = ['username','email','password1','password2']
 
 class InventoryItemForm(forms.ModelForm):
-	category = forms.ModelChoiceField(queryset=Category.objects.all(), initial=0)
+	quantity = forms.IntegerField(min_value=0)
+	category = CategoryChoiceField(initial=0)
 	class Meta:
 		model = InventoryItem
-		fields = ['name','quantity','category']
+		fields = ['name','quantity','category','reorder_point','par_level','reorder_qty']
+
+class EditItemForm(InventoryItemForm):
+	# The quantity the form showed; a changed quantity is counted against it, like DailyCount's orig- fields
+	original_quantity = forms.IntegerField(widget=forms.HiddenInput)
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.fields['original_quantity'].initial = self.instance.quantity
+
+class ImportItemsForm(forms.Form):
+	file = forms.FileField(help_text='CSV with name, quantity and category columns, or JSONL with the same keys.')
+	format = forms.ChoiceField(choices=[('', 'From file extension'), ('csv', 'CSV'), ('jsonl', 'JSONL')], required=False)
 
 class CategoryForm(forms.ModelForm):
+    # Shows the hierarchy in the dropdown, read from the category tree cache
+    parent = CategoryChoiceField(required=False)
+
     class Meta:
         model = Category
-        fields = ['name', 'parent']
+        fields = ['name', 'parent', 'reorder_point', 'par_level', 'reorder_qty']
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Adjust parent field to show a hierarchy in a dropdown
-        self.fields['parent'].queryset = Category.objects.all()
\ No newline at end of file
+    def clean_parent(self):
+        parent = self.cleaned_data['parent']
+        # A category cannot be moved below itself or one of its own subcategories
+        if parent and self.instance.pk and parent.pk in get_tree().subtree_ids(self.instance.pk):
+            raise forms.ValidationError('A category cannot be placed under its own subcategory.')
+        return parent
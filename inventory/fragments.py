@@ -0,0 +1,51 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.middleware.csrf import get_token
+from django.utils.safestring import mark_safe
+
+# Rendered into cached fragments instead of a real token, swapped back per request
+CSRF_PLACEHOLDER = 'csrf-token-placeholder'
+
+
+def fragment_cache():
+    return caches[settings.FRAGMENT_CACHE]
+
+
+def fragment_key(name, *parts):
+    # Cursors make the parts long; hash them so the key suits memcached/Redis too
+    digest = hashlib.md5('\x1f'.join(map(str, parts)).encode()).hexdigest()
+    return f'inventory:fragment:{name}:{digest}'
+
+
+def cached_fragment(key, build):
+    """
+    Return the dict cached under ``key``, or ``build()`` it and cache it.
+    ``key`` None disables caching. Keys embed the inventory version, which the
+    item and category signals bump, so changed data is never served from here.
+    """
+    if key is None:
+        return build()
+    cache = fragment_cache()
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = build()
+        cache.set(key, fragment)
+    return fragment
+
+
+async def acached_fragment(key, build):
+    """``cached_fragment`` for async views; ``build`` is a coroutine function."""
+    if key is None:
+        return await build()
+    cache = fragment_cache()
+    fragment = await cache.aget(key)
+    if fragment is None:
+        fragment = await build()
+        await cache.aset(key, fragment)
+    return fragment
+
+
+def with_csrf_token(request, html):
+    return mark_safe(html.replace(CSRF_PLACEHOLDER, get_token(request)))
@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+import re
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import category_tree
+from .batch import create_items
+from .forms import InventoryItemForm
+from .models import Category, CategoryClosure, InventoryItem
+
+PATH_SPLIT = re.compile(r'\s*[›>]\s*')
+MAX_REPORTED_ERRORS = 20
+QUANTITY_FIELD = InventoryItemForm.base_fields['quantity']
+
+
+def read_rows(stream, format):
+    """Yield one dict per CSV/JSONL record from a text stream, without reading it all."""
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+    elif format == 'jsonl':
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+    else:
+        raise ValueError(f'Unknown import format {format!r}')
+
+
+def guess_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def text_stream(binary):
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.categories_created = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return (self.created + self.skipped) / self.seconds if self.seconds else 0.0
+
+    def skip(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'row {line}: {message}')
+
+
+class CategoryResolver:
+    """
+    Maps category names and paths ("Food > Dairy") to ids from a dict preloaded
+    from the category tree, creating missing categories in bulk per chunk.
+    """
+
+    def __init__(self):
+        tree = category_tree.get_tree()
+        self.lineage = {}
+        self.by_path = {}
+        self.by_name = {}
+        self.names = {}
+        for node in tree.ordered:
+            self.names[node.id] = node.name
+            parent_lineage = self.lineage.get(node.parent_id, [])
+            self.lineage[node.id] = parent_lineage + [node.id]
+            self.by_path[tuple(PATH_SPLIT.split(node.path.lower()))] = node.id
+            self.by_name.setdefault(node.name.lower(), node.id)
+        self.created = 0
+
+    @staticmethod
+    def key(value):
+        value = (value or '').strip()
+        return tuple(part for part in PATH_SPLIT.split(value)) if value else ()
+
+    def lookup(self, key):
+        if not key:
+            return None
+        lowered = tuple(part.lower() for part in key)
+        if lowered in self.by_path:
+            return self.by_path[lowered]
+        if len(key) == 1:
+            return self.by_name.get(lowered[0])
+        return None
+
+    def create_missing(self, keys):
+        missing = {key[:depth] for key in keys for depth in range(1, len(key) + 1) if self.lookup(key[:depth]) is None}
+        # Parents first, one bulk insert per depth level
+        for depth in sorted({len(key) for key in missing}):
+            level = sorted(key for key in missing if len(key) == depth)
+            categories = [Category(name=key[-1], parent_id=self.lookup(key[:-1])) for key in level]
+            Category.objects.bulk_create(categories)
+            links = []
+            for key, category in zip(level, categories):
+                self.lineage[category.pk] = self.lineage.get(category.parent_id, []) + [category.pk]
+                self.by_path[tuple(part.lower() for part in key)] = category.pk
+                self.by_name.setdefault(key[-1].lower(), category.pk)
+                self.names[category.pk] = category.name
+                lineage = self.lineage[category.pk]
+                links.extend(
+                    CategoryClosure(ancestor_id=ancestor_id, descendant_id=category.pk, depth=len(lineage) - 1 - position)
+                    for position, ancestor_id in enumerate(lineage)
+                )
+            CategoryClosure.objects.bulk_create(links)
+            self.created += len(categories)
+        if missing:
+            # bulk_create sends no signals, so the tree cache is invalidated here
+            category_tree.invalidate()
+            transaction.on_commit(category_tree.invalidate)
+
+
+def import_items(rows, user, chunk_size=None):
+    """
+    Create InventoryItems for ``user`` from an iterable of dicts with ``name``,
+    ``quantity`` and optional ``category`` keys. Rows are consumed chunk by
+    chunk, each chunk in its own transaction, so memory use does not grow with
+    the input. Ledger, audit and summary rows are written in bulk alongside
+    (see ``batch.create_items``).
+    """
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    result = ImportResult()
+    resolver = CategoryResolver()
+    started = time.perf_counter()
+    rows = enumerate(rows, start=1)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        parsed = []
+        for line, row in chunk:
+            if not isinstance(row, dict):
+                result.skip(line, 'not a JSON object')
+                continue
+            name = str(row.get('name') or '').strip()
+            if not name or len(name) > InventoryItem._meta.get_field('name').max_length:
+                result.skip(line, 'missing or too long name')
+                continue
+            try:
+                # Same rule and message as the item form and the API
+                quantity = QUANTITY_FIELD.clean(row.get('quantity'))
+            except ValidationError as error:
+                result.skip(line, f'quantity: {error.messages[0]}')
+                continue
+            parsed.append((name, quantity, resolver.key(row.get('category'))))
+
+        with transaction.atomic():
+            resolver.create_missing({key for _, _, key in parsed if key})
+            items = create_items(user, [
+                InventoryItem(name=name, quantity=quantity, category_id=resolver.lookup(key), user=user)
+                for name, quantity, key in parsed
+            ], note='Imported', category_names=resolver.names)
+
+        result.created += len(items)
+
+    result.categories_created = resolver.created
+    result.seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,202 @@
+import time
+from contextvars import ContextVar
+from functools import wraps
+from importlib import import_module
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.urls import Resolver404, resolve
+
+
+class QueryTimer:
+    """Context manager counting the queries run on the default connection and their total time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+    async def __aenter__(self):
+        # Under ASGI the ORM runs on the request's sync thread, whose connection object is not this thread's
+        await sync_to_async(QueryTimer.__enter__)(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await sync_to_async(QueryTimer.__exit__)(self, *exc_info)
+
+
+class CallTimer:
+    """
+    Base for context managers counting the outermost calls to some methods
+    and their total time, in the current thread or task. ``hook()`` wraps the
+    methods once with ``wrap()``; outside a timer the wrappers only check a
+    context variable.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Timers active in this context, and whether an outer call is already being timed
+        cls._active = ContextVar(f'{cls.__name__}_active', default=())
+        cls._running = ContextVar(f'{cls.__name__}_running', default=False)
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self._token = None
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    @classmethod
+    def hook(cls):
+        raise NotImplementedError
+
+    @classmethod
+    def wrap(cls, owner, *names):
+        for name in names:
+            method = getattr(owner, name)
+            if getattr(method, 'timed_by', None) is cls:
+                continue
+            setattr(owner, name, cls._timed(method))
+
+    @classmethod
+    def _timed(cls, method):
+        if iscoroutinefunction(method):
+            @wraps(method)
+            async def timed(*args, **kwargs):
+                timers = cls._active.get()
+                if not timers or cls._running.get():
+                    return await method(*args, **kwargs)
+                token = cls._running.set(True)
+                start = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    cls._running.reset(token)
+                    cls._add(timers, time.perf_counter() - start)
+        else:
+            @wraps(method)
+            def timed(*args, **kwargs):
+                timers = cls._active.get()
+                if not timers or cls._running.get():
+                    return method(*args, **kwargs)
+                token = cls._running.set(True)
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    cls._running.reset(token)
+                    cls._add(timers, time.perf_counter() - start)
+
+        timed.timed_by = cls
+        return timed
+
+    @staticmethod
+    def _add(timers, elapsed):
+        for timer in timers:
+            timer.count += 1
+            timer.duration += elapsed
+
+    def __enter__(self):
+        self.hook()
+        self._token = self._active.set(self._active.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._active.reset(self._token)
+
+
+class RenderTimer(CallTimer):
+    """Times top-level template renders, including any queries the template itself triggers."""
+
+    @classmethod
+    def hook(cls):
+        from django.template.backends.django import Template
+
+        cls.wrap(Template, 'render')
+
+
+class SessionTimer(CallTimer):
+    """Times session loads, saves and deletes of the configured session engine."""
+
+    @classmethod
+    def hook(cls):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        # Django 5.1+ also has async variants, which async views use
+        names = [name for name in ('load', 'save', 'delete', 'aload', 'asave', 'adelete') if hasattr(store, name)]
+        cls.wrap(store, *names)
+
+
+def url_match(request):
+    """
+    Resolve the request path before the URL dispatcher does, for middleware
+    deciding whether to profile a request; None for unknown paths.
+    """
+    if not hasattr(request, '_url_match'):
+        try:
+            request._url_match = resolve(request.path_info)
+        except Resolver404:
+            request._url_match = None
+    return request._url_match
+
+
+class ProfilingMiddleware:
+    """
+    Base for sync and async middleware measuring requests: ``profile(request)``
+    returns a context manager (with async support) entered around the rest of
+    the chain, or None to pass the request straight through, and
+    ``finish(request, response, profile)`` returns the response once it has left.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = self.profile(request)
+        if profile is None:
+            return self.get_response(request)
+        with profile:
+            response = self.get_response(request)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = self.profile(request)
+        if profile is None:
+            return await self.get_response(request)
+        async with profile:
+            response = await self.get_response(request)
+        return self.finish(request, response, profile)
+
+    def profile(self, request):
+        raise NotImplementedError
+
+    def finish(self, request, response, profile):
+        return response
@@ -0,0 +1,96 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# The stock SQLite setup this project shipped with, for comparison
+BASELINE = {'init': ['PRAGMA journal_mode = DELETE', 'PRAGMA synchronous = FULL'], 'begin': 'BEGIN'}
+
+
+class Command(BaseCommand):
+    help = ('Compare concurrent-writer throughput of the stock SQLite configuration with the tuned '
+            'one from settings (WAL, pragmas, BEGIN IMMEDIATE) on a scratch database file.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Concurrent writer threads.')
+        parser.add_argument('--transactions', type=int, default=200, help='Transactions per writer.')
+        parser.add_argument('--items', type=int, default=1000, help='Rows in the scratch item table.')
+
+    def handle(self, *args, writers, transactions, items, **options):
+        options = settings.DATABASES['default'].get('OPTIONS', {})
+        tuned = {
+            'init': options.get('init_command', '').split(';'),
+            'begin': 'BEGIN ' + (options.get('transaction_mode') or ''),
+        }
+        results = {}
+        for label, config in (('baseline', BASELINE), ('tuned', tuned)):
+            results[label] = self.run(config, writers, transactions, items)
+            committed, failed, seconds = results[label]
+            self.stdout.write(f'{label:>8}: {committed} commits, {failed} lock errors, '
+                              f'{seconds:.2f}s, {committed / seconds:.0f} commits/sec')
+
+        baseline_rate = results['baseline'][0] / results['baseline'][2]
+        tuned_rate = results['tuned'][0] / results['tuned'][2]
+        if baseline_rate:
+            self.stdout.write(self.style.SUCCESS(f'Tuned throughput is {tuned_rate / baseline_rate:.1f}x the baseline'))
+
+    def connect(self, path, config):
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        for statement in config['init']:
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def run(self, config, writers, transactions, items):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'bench.sqlite3')
+        setup = self.connect(path, config)
+        setup.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, quantity INTEGER NOT NULL)')
+        setup.execute('CREATE TABLE movement (id INTEGER PRIMARY KEY, item_id INTEGER, delta INTEGER, balance INTEGER)')
+        setup.executemany('INSERT INTO item (id, quantity) VALUES (?, 0)', [(i,) for i in range(items)])
+        setup.close()
+
+        counts = {'committed': 0, 'failed': 0}
+        lock = threading.Lock()
+
+        def writer():
+            conn = self.connect(path, config)
+            rng = random.Random()
+            committed = failed = 0
+            for _ in range(transactions):
+                # Read-modify-write, the shape of an edit plus its ledger/audit row
+                item_id, delta = rng.randrange(items), rng.randint(-5, 5)
+                try:
+                    conn.execute(config['begin'])
+                    (quantity,) = conn.execute('SELECT quantity FROM item WHERE id = ?', (item_id,)).fetchone()
+                    conn.execute('UPDATE item SET quantity = ? WHERE id = ?', (quantity + delta, item_id))
+                    conn.execute('INSERT INTO movement (item_id, delta, balance) VALUES (?, ?, ?)',
+                                 (item_id, delta, quantity + delta))
+                    conn.execute('COMMIT')
+                    committed += 1
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    failed += 1
+            conn.close()
+            with lock:
+                counts['committed'] += committed
+                counts['failed'] += failed
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+        return counts['committed'], counts['failed'], seconds
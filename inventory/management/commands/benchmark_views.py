@@ -0,0 +1,60 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the dashboard (every sort), reports, items-by-category, edit and delete views for one '
+            'user, recording latency, query count, DB time, render time and peak memory. Writes a JSON '
+            'baseline with --output and fails on regressions against one with --compare, e.g.:\n'
+            '  manage.py generate_inventory_data --users 1 --items 20000\n'
+            '  manage.py benchmark_views --output before.json\n'
+            '  (change the code)\n'
+            '  manage.py benchmark_views --compare before.json')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench0001', help='Username whose inventory is requested.')
+        parser.add_argument('--repeat', type=int, default=20, help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per scenario first.')
+        parser.add_argument('--scenario', action='append', dest='names', help='Only run this scenario; repeatable.')
+        parser.add_argument('--output', help='Write the results and run metadata to this JSON file.')
+        parser.add_argument('--compare', help='Baseline JSON file written by an earlier --output.')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed slowdown as a fraction of the baseline before it counts as a regression.')
+
+    def handle(self, *args, user, repeat, warmup, names, output, compare, tolerance, **options):
+        try:
+            user = User.objects.get(username=user)
+        except User.DoesNotExist:
+            raise CommandError(f'No user {user!r}; create one with manage.py generate_inventory_data')
+        if repeat < 1:
+            raise CommandError('--repeat must be at least 1')
+        baseline = None
+        if compare:
+            try:
+                with open(compare) as baseline_file:
+                    baseline = json.load(baseline_file)['results']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Cannot read baseline {compare}: {e}')
+
+        results = benchmarks.run(user, repeat=repeat, warmup=warmup, names=names)
+        for name, stats in results.items():
+            self.stdout.write(
+                f'{name:<22} median {stats["median_ms"]:8.2f} ms  p95 {stats["p95_ms"]:8.2f} ms  '
+                f'{stats["queries"]:3} queries  db {stats["db_ms"]:7.2f} ms  render {stats["render_ms"]:7.2f} ms  '
+                f'peak {stats["peak_kib"]:8.0f} KiB'
+            )
+
+        if output:
+            with open(output, 'w') as output_file:
+                json.dump({'meta': benchmarks.metadata(user), 'results': results}, output_file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {output}'))
+
+        if baseline is not None:
+            regressions = benchmarks.compare(baseline, results, tolerance)
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {compare}'))
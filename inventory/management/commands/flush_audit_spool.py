@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from inventory.audit import replay_spool
+
+
+class Command(BaseCommand):
+    help = 'Write audit entries left in the spool files (e.g. after a crash) to the AuditLog table.'
+
+    def handle(self, *args, **options):
+        replayed = replay_spool(settings.AUDIT_SPOOL_DIR)
+        self.stdout.write(self.style.SUCCESS(f'Replayed {replayed} audit entries'))
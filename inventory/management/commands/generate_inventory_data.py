@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = ('Fill the database with synthetic users, a category tree, items (with their ledger, audit and '
+            'summary rows) and extra audit history, for benchmarks. Rerunning reuses the users and categories '
+            'and adds more items.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Users to create, named PREFIX0001 and up.')
+        parser.add_argument('--depth', type=int, default=3, help='Levels in the category tree.')
+        parser.add_argument('--roots', type=int, default=6, help='Top-level categories.')
+        parser.add_argument('--fanout', type=int, default=4, help='Subcategories per category.')
+        parser.add_argument('--items', type=int, default=1000, help='Items per user.')
+        parser.add_argument('--audit', type=int, default=1000, help='Extra UPDATE audit rows per user.')
+        parser.add_argument('--prefix', default='bench', help='Username prefix.')
+        parser.add_argument('--password', default='bench', help='Password of every generated user.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable data.')
+
+    def handle(self, *args, users, depth, roots, fanout, items, audit, prefix, password, seed, **options):
+        if min(users, depth, roots, fanout) < 1 or min(items, audit) < 0:
+            raise CommandError('--users, --depth, --roots and --fanout must be at least 1; --items and --audit '
+                               'cannot be negative')
+        started = time.perf_counter()
+        counts = generate(users=users, depth=depth, roots=roots, fanout=fanout, items=items, audit_rows=audit,
+                          prefix=prefix, password=password, seed=seed, log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f'{counts["users"]} users, {counts["categories"]} categories, {counts["items"]} items and '
+            f'{counts["audit_rows"]} audit rows in {time.perf_counter() - started:.1f}s'
+        ))
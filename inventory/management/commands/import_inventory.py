@@ -0,0 +1,37 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importer import guess_format, import_items, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Stream InventoryItems for one user from a CSV or JSONL file (columns: name, quantity, category).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin.")
+        parser.add_argument('--user', required=True, help='Username that will own the items.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, help='Rows per bulk insert and transaction (default IMPORT_CHUNK_SIZE).')
+
+    def handle(self, *args, path, user, format=None, chunk_size=None, **options):
+        try:
+            owner = User.objects.get(username=user)
+        except User.DoesNotExist:
+            raise CommandError(f'Unknown user {user!r}')
+
+        format = format or guess_format(path)
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        try:
+            result = import_items(read_rows(stream, format), owner, chunk_size=chunk_size)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in result.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} items ({result.skipped} skipped, {result.categories_created} new categories) '
+            f'in {result.seconds:.2f}s, {result.rows_per_second:.0f} rows/sec'
+        ))
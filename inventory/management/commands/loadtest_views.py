@@ -0,0 +1,137 @@
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ['/dashboard/', '/low-stock/', '/inventory-summary/']
+
+
+class Command(BaseCommand):
+    help = ('Load-test the dashboard and report views on running servers and compare requests/sec and '
+            'latency percentiles, e.g. WSGI against ASGI:\n'
+            '  gunicorn inventory_management.wsgi -w 4 -b 127.0.0.1:8000\n'
+            '  uvicorn inventory_management.asgi:application --workers 4 --port 8001\n'
+            '  manage.py loadtest_views --target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001 '
+            '--user storekeeper\n'
+            'Both servers must use this database; the session is created here directly.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True,
+                            help='NAME=BASE_URL of a running server; repeat to compare several.')
+        parser.add_argument('--user', required=True, help='Username whose inventory is requested.')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help=f'Path to request; repeatable (default: {", ".join(DEFAULT_PATHS)}).')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per path and target.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent client connections.')
+        parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per path first.')
+        parser.add_argument('--revalidate', action='store_true',
+                            help='Send If-None-Match with the first ETag, measuring the 304 path.')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file.')
+
+    def handle(self, *args, target, user, paths, requests, concurrency, warmup, revalidate, json_path, **options):
+        try:
+            user = User.objects.get(username=user)
+        except User.DoesNotExist:
+            raise CommandError(f'No user {user!r}')
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.create_session(user)}'
+
+        results = {}
+        for spec in target:
+            name, _, url = spec.partition('=')
+            if not url:
+                raise CommandError(f'--target must look like NAME=URL, got {spec!r}')
+            for path in paths or DEFAULT_PATHS:
+                client = Client(url, cookie)
+                etag = client.prime(path, warmup)
+                headers = {'If-None-Match': etag} if revalidate and etag else {}
+                stats = client.run(path, requests, concurrency, headers)
+                results.setdefault(name, {})[path] = stats
+                self.stdout.write(
+                    f'{name:>6} {path:<24} {stats["requests_per_second"]:8.1f} req/s  '
+                    f'p50 {stats["p50_ms"]:7.1f} ms  p99 {stats["p99_ms"]:7.1f} ms  '
+                    f'errors {stats["errors"]}  statuses {stats["statuses"]}'
+                )
+
+        if json_path:
+            with open(json_path, 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {json_path}'))
+
+    def create_session(self, user):
+        # What Client.force_login does, so no password is needed
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
+
+
+class Client:
+    """Keep-alive HTTP connections, one per worker thread."""
+
+    def __init__(self, base_url, cookie):
+        parts = urlsplit(base_url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.cookie = cookie
+        self.local = threading.local()
+
+    def request(self, path, headers=None):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = self.connection_class(self.netloc, timeout=30)
+        started = time.perf_counter()
+        try:
+            connection.request('GET', self.prefix + path, headers={'Cookie': self.cookie, **(headers or {})})
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self.local.connection = None
+            return None, time.perf_counter() - started, None
+        return response.status, time.perf_counter() - started, response.getheader('ETag')
+
+    def prime(self, path, warmup):
+        etag = None
+        for _ in range(max(warmup, 1)):
+            status, _, etag = self.request(path)
+            if status and status >= 300:
+                raise CommandError(f'GET {path} answered {status}; is the user logged in on that server?')
+        return etag
+
+    def run(self, path, requests, concurrency, headers):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(lambda _: self.request(path, headers), range(requests)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(seconds * 1000 for _, seconds, _ in samples)
+        statuses = {}
+        for status, _, _ in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            'requests': requests,
+            'concurrency': concurrency,
+            'requests_per_second': requests / elapsed,
+            'p50_ms': percentile(latencies, 50),
+            'p99_ms': percentile(latencies, 99),
+            'errors': statuses.get('None', 0),
+            'statuses': statuses,
+        }
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(percent / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import InventorySummary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the InventorySummary counters from the item table, or check them for drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report drift; exit with an error if any is found.')
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Limit to this user id (repeatable).')
+
+    def handle(self, *args, check=False, user_ids=None, **options):
+        if check:
+            drift = InventorySummary.drift(user_ids)
+            for (user_id, category_id), (stored, expected) in sorted(drift.items(), key=str):
+                self.stdout.write(f'user={user_id} category={category_id} stored={stored} expected={expected}')
+            if drift:
+                raise CommandError(f'{len(drift)} summary rows have drifted')
+            self.stdout.write(self.style.SUCCESS('Inventory summary is consistent'))
+            return
+
+        rows = InventorySummary.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} summary rows'))
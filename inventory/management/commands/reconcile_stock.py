@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.stock import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recompute item quantities from the StockMovement ledger and fix any that disagree.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report mismatches; exit with an error if any are found.')
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Limit to this user id (repeatable).')
+
+    def handle(self, *args, check=False, user_ids=None, **options):
+        mismatched = reconcile(user_ids, dry_run=check)
+        for item, balance in mismatched:
+            self.stdout.write(f'item={item.pk} {item.name!r}: quantity={item.quantity} ledger={balance}')
+        if check and mismatched:
+            raise CommandError(f'{len(mismatched)} items disagree with the ledger')
+        verb = 'disagree with' if check else 'reconciled from'
+        self.stdout.write(self.style.SUCCESS(f'{len(mismatched)} items {verb} the ledger'))
@@ -0,0 +1,405 @@
+"""
+In-process metrics in the Prometheus text format, served at /metrics.
+
+Counters, histograms and gauges live in a store: a dict when
+settings.METRICS_DIR is unset (one process, e.g. runserver), otherwise one
+mmap-backed file per process in that directory, so every gunicorn worker
+writes its own file and a scrape of any worker adds them all up. Gauges
+only count the files of processes that are still running. Clear the
+directory when the server starts, e.g. in gunicorn's ``on_starting`` hook.
+"""
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .instrumentation import ProfilingMiddleware, url_match
+
+METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+class MemoryStore:
+    """Sample values of this process only."""
+
+    def __init__(self):
+        self.values = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def add(self, key, amount):
+        with self.lock:
+            self.values[key] += amount
+
+    def set(self, key, value):
+        with self.lock:
+            self.values[key] = value
+
+    def read(self):
+        # (key, value, process alive) for every sample
+        with self.lock:
+            return [(key, value, True) for key, value in self.values.items()]
+
+
+class MmapFile:
+    """
+    A file of (key, float) entries written through mmap: an 8-byte header
+    holding the used length, then per entry a 4-byte key length, the key
+    padded to 8-byte alignment and the value as a double.
+    """
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.file = open(path, 'a+b')
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.file.truncate(self.INITIAL_SIZE)
+        self.capacity = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), self.capacity)
+        self.used = struct.unpack_from('i', self.map, 0)[0] or 8
+        self.positions = {key: position for key, _, position in read_entries(self.map, self.used)}
+
+    def _position(self, key):
+        position = self.positions.get(key)
+        if position is None:
+            encoded = key.encode()
+            padded = encoded + b' ' * (8 - (len(encoded) + 4) % 8)
+            entry = struct.pack(f'i{len(padded)}sd', len(encoded), padded, 0.0)
+            while self.used + len(entry) > self.capacity:
+                self.capacity *= 2
+                self.file.truncate(self.capacity)
+                self.map.close()
+                self.map = mmap.mmap(self.file.fileno(), self.capacity)
+            self.map[self.used:self.used + len(entry)] = entry
+            self.used += len(entry)
+            # The header moves last, so a reader never sees a half-written entry
+            struct.pack_into('i', self.map, 0, self.used)
+            position = self.positions[key] = self.used - 8
+        return position
+
+    def add(self, key, amount):
+        position = self._position(key)
+        struct.pack_into('d', self.map, position, struct.unpack_from('d', self.map, position)[0] + amount)
+
+    def set(self, key, value):
+        struct.pack_into('d', self.map, self._position(key), value)
+
+
+def read_entries(data, used=None):
+    used = used or struct.unpack_from('i', data, 0)[0]
+    position = 8
+    while position < used:
+        length = struct.unpack_from('i', data, position)[0]
+        key = bytes(data[position + 4:position + 4 + length]).decode()
+        position += 4 + length + (8 - (length + 4) % 8)
+        yield key, struct.unpack_from('d', data, position)[0], position
+        position += 8
+
+
+def pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        return windows_pid_alive(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def windows_pid_alive(pid):
+    # os.kill(pid, 0) terminates the process on Windows, so ask for its exit code instead
+    import ctypes
+    from ctypes import wintypes
+
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+    if not handle:
+        return ctypes.get_last_error() == 5  # ERROR_ACCESS_DENIED: it exists
+    try:
+        code = wintypes.DWORD()
+        return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259  # STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+class MmapStore:
+    """This process writes <directory>/metrics-<pid>.db; reads cover every process's file."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.file = MmapFile(self.directory / f'metrics-{os.getpid()}.db')
+        self.lock = threading.Lock()
+
+    def add(self, key, amount):
+        with self.lock:
+            self.file.add(key, amount)
+
+    def set(self, key, value):
+        with self.lock:
+            self.file.set(key, value)
+
+    def read(self):
+        samples = []
+        for path in self.directory.glob('metrics-*.db'):
+            alive = pid_alive(int(path.stem.split('-')[1]))
+            with open(path, 'rb') as metrics_file:
+                data = metrics_file.read()
+            if len(data) >= 8:
+                samples.extend((key, value, alive) for key, value, _ in read_entries(data))
+        return samples
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._keys = {}
+
+    def key(self, suffix, labels, extra=()):
+        # Store keys are cached per label values, since they are built on every write
+        cache_key = (suffix, labels, extra)
+        key = self._keys.get(cache_key)
+        if key is None:
+            if sorted(name for name, _ in labels) != sorted(self.labelnames):
+                raise ValueError(f'{self.name} takes labels {self.labelnames}, got {sorted(labels)}')
+            pairs = sorted((name, str(value)) for name, value in labels) + list(extra)
+            key = self._keys[cache_key] = json.dumps([self.name, suffix, pairs])
+        return key
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.store.add(self.key('', tuple(labels.items())), amount)
+
+
+class Gauge(Metric):
+    """A per-process value; the exposed value is the sum over running processes."""
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        self.registry.store.add(self.key('', tuple(labels.items())), amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        self.registry.store.set(self.key('', tuple(labels.items())), value)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=REQUEST_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        labels = tuple(labels.items())
+        index = bisect.bisect_left(self.buckets, value)
+        bound = format_value(self.buckets[index]) if index < len(self.buckets) else '+Inf'
+        store = self.registry.store
+        # Buckets are stored non-cumulative and summed up when exposed
+        store.add(self.key('_bucket', labels, (('le', bound),)), 1)
+        store.add(self.key('_sum', labels), value)
+        store.add(self.key('_count', labels), 1)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self._store = None
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    directory = getattr(settings, 'METRICS_DIR', None)
+                    self._store = MmapStore(directory) if directory else MemoryStore()
+        return self._store
+
+    def reset(self):
+        # Forked workers open their own file on first write
+        self._store = None
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(self, name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(self, name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=REQUEST_BUCKETS):
+        return self.register(Histogram(self, name, help, labelnames, buckets))
+
+    def collector(self, func):
+        """
+        Register ``func() -> [(name, help, type, [(labels dict, value), ...])]``,
+        computed at every scrape rather than stored.
+        """
+        self.collectors.append(func)
+        return func
+
+    def expose(self):
+        totals = defaultdict(float)
+        for key, value, alive in self.store.read():
+            name, suffix, pairs = json.loads(key)
+            metric = self.metrics.get(name)
+            if metric is None or (metric.type == 'gauge' and not alive):
+                continue
+            totals[name, suffix, tuple(map(tuple, pairs))] += value
+
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            samples = sorted((suffix, pairs, value) for (sample_name, suffix, pairs), value in totals.items()
+                             if sample_name == name)
+            if metric.type == 'histogram':
+                samples = cumulative_buckets(metric, samples)
+            lines.extend(family(name, metric.help, metric.type, samples))
+        for collect in self.collectors:
+            for name, help, type, samples in collect():
+                lines.extend(family(name, help, type, [('', sorted(labels.items()), value)
+                                                       for labels, value in samples]))
+        return '\n'.join(lines) + '\n'
+
+
+def cumulative_buckets(metric, samples):
+    # Per label set: every bucket as a running total up to +Inf, then _sum and _count
+    series = defaultdict(lambda: {'buckets': {}, 'rest': []})
+    for suffix, pairs, value in samples:
+        labels = tuple(pair for pair in pairs if pair[0] != 'le')
+        if suffix == '_bucket':
+            series[labels]['buckets'][dict(pairs)['le']] = value
+        else:
+            series[labels]['rest'].append((suffix, labels, value))
+    result = []
+    for labels, parts in sorted(series.items()):
+        running = 0
+        for bound in [format_value(bucket) for bucket in metric.buckets] + ['+Inf']:
+            running += parts['buckets'].get(bound, 0)
+            result.append(('_bucket', labels + (('le', bound),), running))
+        result.extend(sorted(parts['rest'], key=lambda sample: sample[0] != '_sum'))
+    return result
+
+
+def family(name, help, type, samples):
+    lines = [f'# HELP {name} {help}', f'# TYPE {name} {type}']
+    for suffix, pairs, value in samples:
+        labels = ','.join(f'{label}="{escape(label_value)}"' for label, label_value in pairs)
+        lines.append(f'{name}{suffix}{{{labels}}} {format_value(value)}' if labels
+                     else f'{name}{suffix} {format_value(value)}')
+    return lines
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def format_value(value):
+    return repr(float(value))
+
+
+registry = Registry()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.reset)
+
+REQUEST_DURATION = registry.histogram(
+    'inventory_request_duration_seconds', 'Request latency by view.', ['view', 'method'])
+REQUESTS = registry.counter(
+    'inventory_requests_total', 'Requests by view, method and status class (2xx, 4xx, ...).', ['view', 'method', 'status'])
+AUDIT_ROWS = registry.counter(
+    'inventory_audit_rows_written_total', 'AuditLog rows written.')
+AUDIT_WRITE_DURATION = registry.histogram(
+    'inventory_audit_write_seconds', 'Time to write one batch (or one row) of audit entries.', buckets=FAST_BUCKETS)
+ITEM_CHANGES = registry.counter(
+    'inventory_item_changes_total', 'Items created, updated and deleted, counted from their audit rows.', ['action'])
+DB_CONNECTIONS_OPENED = registry.counter(
+    'inventory_db_connections_opened_total', 'Database connections opened.')
+DB_CONNECTIONS_OPEN = registry.gauge(
+    'inventory_db_connections_open', 'Database connections currently open.')
+DB_LOCK_WAIT = registry.histogram(
+    'inventory_db_lock_wait_seconds', 'Time spent starting a transaction, i.e. waiting for the write lock.',
+    buckets=FAST_BUCKETS)
+DB_LOCK_TIMEOUTS = registry.counter(
+    'inventory_db_lock_timeouts_total', 'Transactions that gave up waiting for the write lock.')
+
+
+def record_audit_write(entries, seconds):
+    AUDIT_WRITE_DURATION.observe(seconds)
+    AUDIT_ROWS.inc(len(entries))
+    actions = defaultdict(int)
+    for entry in entries:
+        actions[entry['action'].lower()] += 1
+    for action, count in actions.items():
+        ITEM_CHANGES.inc(count, action=action)
+
+
+@registry.collector
+def low_stock_counts():
+    # From the per-category counters the item signals keep, so one grouped query per scrape
+    from django.db.models import Sum
+
+    from .models import InventorySummary
+
+    low = InventorySummary.objects.aggregate(low=Sum('low_stock_count'))['low']
+    return [('inventory_low_stock_items', 'Items at or below their reorder point, across all users.', 'gauge',
+             [({}, low or 0)])]
+
+
+class Stopwatch:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self.started
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info):
+        return self.__exit__(*exc_info)
+
+
+class MetricsMiddleware(ProfilingMiddleware):
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def profile(self, request):
+        # Only resolvable paths, so scans of random URLs do not add label values
+        return Stopwatch() if url_match(request) is not None else None
+
+    def finish(self, request, response, stopwatch):
+        view = url_match(request).url_name or 'unnamed'
+        # Client-chosen methods and exact status codes would each add label values
+        method = request.method if request.method in METHODS else 'other'
+        REQUEST_DURATION.observe(stopwatch.seconds, view=view, method=method)
+        REQUESTS.inc(view=view, method=method, status=f'{response.status_code // 100}xx')
+        return response
@@ -0,0 +1,83 @@
+# Generated by Django 5.0.7 on 2026-10-18 03:40
+
+import json
+
+from django.db import migrations, models
+
+
+def wrap_non_json_changes(apps, schema_editor):
+    # JSONField adds a JSON_VALID check, so free-text rows must be wrapped first
+    AuditLog = apps.get_model('inventory', 'AuditLog')
+    for log in AuditLog.objects.all():
+        try:
+            valid = isinstance(json.loads(log.changes), dict)
+        except ValueError:
+            valid = False
+        if not valid:
+            AuditLog.objects.filter(pk=log.pk).update(changes=json.dumps({'text': log.changes}))
+
+
+def backfill_snapshot(apps, schema_editor):
+    AuditLog = apps.get_model('inventory', 'AuditLog')
+    logs = list(AuditLog.objects.all())
+    for log in logs:
+        changes = log.changes if isinstance(log.changes, dict) else {}
+        log.item_name = changes.get('name') or ''
+        log.category_name = changes.get('category')
+    AuditLog.objects.bulk_update(logs, ['item_name', 'category_name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_auditlog_event_timestamp'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='item',
+            field=models.BigIntegerField(),
+        ),
+        migrations.RenameField(
+            model_name='auditlog',
+            old_name='item',
+            new_name='item_id',
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='user',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.RenameField(
+            model_name='auditlog',
+            old_name='user',
+            new_name='user_id',
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='item_name',
+            field=models.CharField(default='', max_length=200),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='category_name',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(wrap_non_json_changes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='changes',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(backfill_snapshot, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['item_id', 'timestamp'], name='auditlog_item_timestamp'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user_id', 'timestamp'], name='auditlog_user_timestamp'),
+        ),
+    ]
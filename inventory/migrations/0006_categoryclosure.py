@@ -0,0 +1,40 @@
+# Generated by Django 5.0.7 on 2026-10-18 04:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_closure(apps, schema_editor):
+    Category = apps.get_model('inventory', 'Category')
+    CategoryClosure = apps.get_model('inventory', 'CategoryClosure')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    rows = []
+    for category_id in parents:
+        ancestor_id, depth = category_id, 0
+        while ancestor_id is not None:
+            rows.append(CategoryClosure(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth))
+            ancestor_id, depth = parents[ancestor_id], depth + 1
+    CategoryClosure.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_auditlog_snapshot_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='inventory.category')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='inventory.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='category_closure_unique')],
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
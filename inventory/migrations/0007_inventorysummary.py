@@ -0,0 +1,44 @@
+# Generated by Django 5.0.7 on 2026-10-18 04:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def build_summary(apps, schema_editor):
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    InventorySummary = apps.get_model('inventory', 'InventorySummary')
+    rows = InventoryItem.objects.values('user_id', 'category_id').annotate(
+        item_count=Count('id'),
+        total_quantity=Sum('quantity'),
+        low_stock_count=Count('id', filter=Q(quantity__lte=settings.LOW_QUANTITY)),
+    ).order_by()
+    InventorySummary.objects.bulk_create([InventorySummary(**row) for row in rows], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_categoryclosure'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_count', models.IntegerField(default=0)),
+                ('total_quantity', models.BigIntegerField(default=0)),
+                ('low_stock_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='inventory.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Inventory summaries',
+                'constraints': [models.UniqueConstraint(fields=('user', 'category'), name='inventory_summary_unique'), models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user',), name='inventory_summary_unique_uncategorized')],
+            },
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
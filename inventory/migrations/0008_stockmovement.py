@@ -0,0 +1,44 @@
+# Generated by Django 5.0.7 on 2026-10-18 05:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    # Existing quantities become the first ledger entry so the ledger sums to them
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    StockMovement.objects.bulk_create([
+        StockMovement(item_id=item_id, kind='COUNT', delta=quantity, balance=quantity, user_id=user_id, note='Opening balance')
+        for item_id, quantity, user_id in InventoryItem.objects.values_list('id', 'quantity', 'user_id')
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_inventorysummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('RECEIVE', 'Received'), ('ISSUE', 'Issued'), ('ADJUST', 'Adjusted'), ('COUNT', 'Counted')], max_length=10)),
+                ('delta', models.IntegerField()),
+                ('balance', models.IntegerField()),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('item', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventory.inventoryitem')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'timestamp'], name='stockmovement_item_timestamp')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.7 on 2026-10-18 06:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_stockmovement'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['user', 'name'], name='item_user_name'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['user', 'quantity'], name='item_user_quantity'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['user', 'category'], name='item_user_category'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(condition=models.Q(('quantity__lte', 3)), fields=['user'], name='item_user_low_stock'),
+        ),
+    ]
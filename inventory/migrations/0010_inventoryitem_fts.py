@@ -0,0 +1,73 @@
+# Generated by Django 5.0.7 on 2026-10-18 06:40
+
+from django.db import migrations
+
+# FTS5 index over item and category names, kept in sync by triggers so bulk
+# inserts/updates (import, daily count, API) are covered as well as save().
+# rowid is the item id; user_id is stored unindexed for filtering.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE inventory_item_fts USING fts5(
+        name, category, user_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER inventory_item_fts_insert AFTER INSERT ON inventory_inventoryitem BEGIN
+        INSERT INTO inventory_item_fts (rowid, name, category, user_id)
+        VALUES (new.id, new.name, (SELECT name FROM inventory_category WHERE id = new.category_id), new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_item_fts_update AFTER UPDATE OF name, category_id ON inventory_inventoryitem BEGIN
+        UPDATE inventory_item_fts
+        SET name = new.name, category = (SELECT name FROM inventory_category WHERE id = new.category_id)
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_item_fts_delete AFTER DELETE ON inventory_inventoryitem BEGIN
+        DELETE FROM inventory_item_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_category_fts_rename AFTER UPDATE OF name ON inventory_category BEGIN
+        UPDATE inventory_item_fts SET category = new.name
+        WHERE rowid IN (SELECT id FROM inventory_inventoryitem WHERE category_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO inventory_item_fts (rowid, name, category, user_id)
+    SELECT item.id, item.name, category.name, item.user_id
+    FROM inventory_inventoryitem item LEFT JOIN inventory_category category ON category.id = item.category_id
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS inventory_category_fts_rename',
+    'DROP TRIGGER IF EXISTS inventory_item_fts_delete',
+    'DROP TRIGGER IF EXISTS inventory_item_fts_update',
+    'DROP TRIGGER IF EXISTS inventory_item_fts_insert',
+    'DROP TABLE IF EXISTS inventory_item_fts',
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        # Other backends fall back to icontains search (see inventory.search)
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_inventoryitem_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
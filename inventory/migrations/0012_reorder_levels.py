@@ -0,0 +1,85 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:20
+
+import inventory.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+# On SQLite, AddField of a NOT NULL column rebuilds the item table, which drops
+# the search triggers of 0010 (and fails on the one for category renames).
+# ADD COLUMN with a default keeps them; every existing item starts at the
+# global LOW_QUANTITY, as no category has a reorder point yet.
+def add_effective_reorder_point(apps, schema_editor):
+    model = apps.get_model('inventory', 'InventoryItem')
+    if schema_editor.connection.vendor != 'sqlite':
+        schema_editor.add_field(model, model._meta.get_field('effective_reorder_point'))
+        return
+    schema_editor.execute(
+        'ALTER TABLE inventory_inventoryitem ADD COLUMN effective_reorder_point integer NOT NULL '
+        f'DEFAULT {int(settings.LOW_QUANTITY)}'
+    )
+
+
+def remove_effective_reorder_point(apps, schema_editor):
+    model = apps.get_model('inventory', 'InventoryItem')
+    if schema_editor.connection.vendor != 'sqlite':
+        schema_editor.remove_field(model, model._meta.get_field('effective_reorder_point'))
+        return
+    schema_editor.execute('ALTER TABLE inventory_inventoryitem DROP COLUMN effective_reorder_point')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_inventoryversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='inventoryitem',
+            name='item_user_low_stock',
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='par_level',
+            field=models.PositiveIntegerField(blank=True, help_text="Leave empty to use the parent category's value.", null=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='reorder_point',
+            field=models.PositiveIntegerField(blank=True, help_text="Leave empty to use the parent category's value.", null=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='reorder_qty',
+            field=models.PositiveIntegerField(blank=True, help_text="Leave empty to use the parent category's value.", null=True, verbose_name='reorder quantity'),
+        ),
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AddField(
+                model_name='inventoryitem',
+                name='effective_reorder_point',
+                field=models.IntegerField(default=inventory.models.default_reorder_point, editable=False),
+            ),
+        ]),
+        migrations.RunPython(add_effective_reorder_point, remove_effective_reorder_point),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='par_level',
+            field=models.PositiveIntegerField(blank=True, help_text="Leave empty to use the category's value.", null=True),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='reorder_point',
+            field=models.PositiveIntegerField(blank=True, help_text="Leave empty to use the category's value.", null=True),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='reorder_qty',
+            field=models.PositiveIntegerField(blank=True, help_text="Leave empty to use the category's value.", null=True, verbose_name='reorder quantity'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(condition=models.Q(('quantity__lte', models.F('effective_reorder_point'))), fields=['user'], name='item_user_low_stock'),
+        ),
+    ]
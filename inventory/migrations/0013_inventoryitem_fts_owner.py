@@ -0,0 +1,62 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:30
+
+from importlib import import_module
+
+from django.db import migrations
+
+fts_0010 = import_module('inventory.migrations.0010_inventoryitem_fts')
+
+# Replaces the unindexed user_id column with an indexed owner token ('u<user id>'),
+# so search puts the user filter inside the MATCH and FTS5 only visits the
+# user's rows instead of every user's matches.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE inventory_item_fts USING fts5(
+        name, category, owner,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER inventory_item_fts_insert AFTER INSERT ON inventory_inventoryitem BEGIN
+        INSERT INTO inventory_item_fts (rowid, name, category, owner)
+        VALUES (new.id, new.name, (SELECT name FROM inventory_category WHERE id = new.category_id), 'u' || new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_item_fts_update AFTER UPDATE OF name, category_id ON inventory_inventoryitem BEGIN
+        UPDATE inventory_item_fts
+        SET name = new.name, category = (SELECT name FROM inventory_category WHERE id = new.category_id)
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_item_fts_delete AFTER DELETE ON inventory_inventoryitem BEGIN
+        DELETE FROM inventory_item_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_category_fts_rename AFTER UPDATE OF name ON inventory_category BEGIN
+        UPDATE inventory_item_fts SET category = new.name
+        WHERE rowid IN (SELECT id FROM inventory_inventoryitem WHERE category_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO inventory_item_fts (rowid, name, category, owner)
+    SELECT item.id, item.name, category.name, 'u' || item.user_id
+    FROM inventory_inventoryitem item LEFT JOIN inventory_category category ON category.id = item.category_id
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_reorder_levels'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fts_0010.run(fts_0010.DROP_SQL + CREATE_SQL),
+            fts_0010.run(fts_0010.DROP_SQL + fts_0010.CREATE_SQL),
+        ),
+    ]
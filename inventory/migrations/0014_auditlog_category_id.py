@@ -0,0 +1,31 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill(apps, schema_editor):
+    # Older rows only have the category name; take the item's current category
+    # when its name still matches, otherwise the row stays uncategorized by id
+    AuditLog = apps.get_model('inventory', 'AuditLog')
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    current = InventoryItem.objects.filter(pk=OuterRef('item_id'), category__name=OuterRef('category_name'))
+    AuditLog.objects.filter(category_name__isnull=False).update(
+        category_id=Subquery(current.values('category_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_inventoryitem_fts_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='category_id',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_auditlog_category_id'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='auditlog_item_timestamp',
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user_id', 'item_id', 'timestamp'], name='auditlog_user_item_timestamp'),
+        ),
+    ]
@@ -1,5 +1,18 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Q, Sum
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+# Items at or below their reorder point; a plain column comparison, so one
+# partial index serves every low-stock query
+LOW_STOCK = Q(quantity__lte=F('effective_reorder_point'))
+
+REORDER_HELP = "Leave empty to use the category's value."
+CATEGORY_REORDER_HELP = "Leave empty to use the parent category's value."
+
+def default_reorder_point():
+    return settings.LOW_QUANTITY
 
 class InventoryItem(models.Model):
     name = models.CharField(max_length=200)
@@ -7,13 +20,77 @@ class InventoryItem(models.Model):
     category = models.ForeignKey('Category', on_delete=models.SET_NULL, blank=True, null=True)
     date_created = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    reorder_point = models.PositiveIntegerField(null=True, blank=True, help_text=REORDER_HELP)
+    par_level = models.PositiveIntegerField(null=True, blank=True, help_text=REORDER_HELP)
+    reorder_qty = models.PositiveIntegerField('reorder quantity', null=True, blank=True, help_text=REORDER_HELP)
+    # reorder_point, else the nearest category's, else settings.LOW_QUANTITY;
+    # kept up to date by inventory.reorder on every write
+    effective_reorder_point = models.IntegerField(default=default_reorder_point, editable=False)
+
+    # Fields whose changes are written to the AuditLog
+    TRACKED_FIELDS = ('name', 'quantity', 'category_id', 'reorder_point', 'par_level', 'reorder_qty')
+    # Also remembered, so the summary counters can tell whether a save crossed the reorder point
+    STATE_FIELDS = TRACKED_FIELDS + ('effective_reorder_point',)
+
+    class Meta:
+        # Every view filters by user first, then sorts or filters on one column
+        indexes = [
+            models.Index(fields=['user', 'name'], name='item_user_name'),
+            models.Index(fields=['user', 'quantity'], name='item_user_quantity'),
+            models.Index(fields=['user', 'category'], name='item_user_category'),
+            models.Index(fields=['user'], condition=LOW_STOCK, name='item_user_low_stock'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # post_save handlers (summary counters) commit or roll back with the row;
+        # inside a caller's atomic block that is the caller's transaction, so no savepoint
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_state()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # Reloaded values are the saved state again, as for instances from from_db
+        if fields is None or not hasattr(self, '_saved_state'):
+            self.remember_state()
+            return
+        refreshed = {self._meta.get_field(field).attname for field in fields}
+        for field in self.STATE_FIELDS:
+            if field in refreshed:
+                self._saved_state[field] = getattr(self, field)
+
+    def remember_state(self):
+        deferred = self.get_deferred_fields()
+        self._saved_state = {field: getattr(self, field) for field in self.STATE_FIELDS if field not in deferred}
+
+    def changed_fields(self, fields=TRACKED_FIELDS):
+        # {field: [old, new]} for tracked fields that differ from the last loaded/saved state
+        saved = getattr(self, '_saved_state', {})
+        deferred = self.get_deferred_fields()
+        changes = {}
+        for field in fields:
+            if field in deferred:
+                continue
+            new = getattr(self, field)
+            if field not in saved or saved[field] != new:
+                changes[field] = [saved.get(field), new]
+        return changes
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='subcategories')
+    # Defaults for the items in this category and its subcategories that do not set their own
+    reorder_point = models.PositiveIntegerField(null=True, blank=True, help_text=CATEGORY_REORDER_HELP)
+    par_level = models.PositiveIntegerField(null=True, blank=True, help_text=CATEGORY_REORDER_HELP)
+    reorder_qty = models.PositiveIntegerField('reorder quantity', null=True, blank=True, help_text=CATEGORY_REORDER_HELP)
 
     def __str__(self):
         return self.name
@@ -22,6 +99,197 @@ class Category(models.Model):
         verbose_name = "Category"
         verbose_name_plural = "Categories"
 
+    def ancestors(self):
+        return Category.objects.filter(
+            descendant_links__descendant=self, descendant_links__depth__gt=0
+        ).order_by('-descendant_links__depth')
+
+    def descendants(self, include_self=True):
+        links = CategoryClosure.objects.filter(ancestor=self)
+        if not include_self:
+            links = links.filter(depth__gt=0)
+        return Category.objects.filter(ancestor_links__in=links)
+
+class CategoryClosure(models.Model):
+    # One row per (ancestor, descendant) pair, including (node, node) at depth 0,
+    # so subtree and ancestor lookups are a single indexed join at any depth
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links', db_index=False)
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='category_closure_unique'),
+        ]
+
+    @classmethod
+    def link(cls, category):
+        """Attach ``category`` (and its subtree) below its current parent."""
+        subtree = list(cls.objects.filter(ancestor=category).values_list('descendant_id', 'depth'))
+        if not subtree:
+            subtree = [(category.pk, 0)]
+            cls.objects.create(ancestor=category, descendant=category, depth=0)
+
+        # Drop the paths from the old ancestors into the subtree
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+        cls.objects.filter(descendant__in=subtree_ids).exclude(ancestor__in=subtree_ids).delete()
+
+        if category.parent_id is None:
+            return
+        parent_paths = cls.objects.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth')
+        cls.objects.bulk_create([
+            cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+            for ancestor_id, ancestor_depth in parent_paths
+            for descendant_id, depth in subtree
+        ])
+
+    @classmethod
+    def parent_changed(cls, category):
+        current = cls.objects.filter(descendant=category, depth=1).values_list('ancestor_id', flat=True).first()
+        return current != category.parent_id
+
+class InventorySummary(models.Model):
+    # Per-user, per-category counters kept up to date by the item signals;
+    # category is NULL for uncategorized items
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
+    item_count = models.IntegerField(default=0)
+    total_quantity = models.BigIntegerField(default=0)
+    low_stock_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Inventory summaries"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='inventory_summary_unique'),
+            models.UniqueConstraint(fields=['user'], condition=Q(category__isnull=True), name='inventory_summary_unique_uncategorized'),
+        ]
+
+    @classmethod
+    def apply(cls, user_id, category_id, item_count=0, total_quantity=0, low_stock_count=0):
+        """Add the deltas to one summary row, creating it for additions."""
+        rows = cls.objects.filter(user_id=user_id, category_id=category_id)
+        deltas = {
+            'item_count': F('item_count') + item_count,
+            'total_quantity': F('total_quantity') + total_quantity,
+            'low_stock_count': F('low_stock_count') + low_stock_count,
+        }
+        # Removals never create rows: the user or category may be mid-delete
+        if rows.update(**deltas) or item_count <= 0:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, category_id=category_id, item_count=item_count,
+                                   total_quantity=total_quantity, low_stock_count=low_stock_count)
+        except IntegrityError:
+            rows.update(**deltas)
+
+    @classmethod
+    def expected(cls, user_ids=None):
+        """Summary values computed from the item table, keyed by (user_id, category_id)."""
+        items = InventoryItem.objects.all()
+        if user_ids is not None:
+            items = items.filter(user_id__in=user_ids)
+        rows = items.values('user_id', 'category_id').annotate(
+            item_count=Count('id'),
+            total_quantity=Sum('quantity'),
+            low_stock_count=Count('id', filter=LOW_STOCK),
+        ).order_by()
+        return {
+            (row['user_id'], row['category_id']): (row['item_count'], row['total_quantity'], row['low_stock_count'])
+            for row in rows
+        }
+
+    @classmethod
+    def drift(cls, user_ids=None):
+        """Return {(user_id, category_id): (stored, expected)} for every row that is off."""
+        expected = cls.expected(user_ids)
+        stored_rows = cls.objects.filter(item_count__gt=0)
+        if user_ids is not None:
+            stored_rows = stored_rows.filter(user_id__in=user_ids)
+        stored = {
+            (user_id, category_id): tuple(values)
+            for user_id, category_id, *values in stored_rows.values_list(
+                'user_id', 'category_id', 'item_count', 'total_quantity', 'low_stock_count')
+        }
+        return {
+            key: (stored.get(key), expected.get(key))
+            for key in stored.keys() | expected.keys()
+            if stored.get(key) != expected.get(key)
+        }
+
+    @classmethod
+    def rebuild(cls, user_ids=None):
+        """Recompute summary rows from the item table, for all users or the given ones."""
+        with transaction.atomic():
+            expected = cls.expected(user_ids)
+            existing = cls.objects.all()
+            if user_ids is not None:
+                existing = existing.filter(user_id__in=user_ids)
+            existing.delete()
+            cls.objects.bulk_create([
+                cls(user_id=user_id, category_id=category_id, item_count=item_count,
+                    total_quantity=total_quantity, low_stock_count=low_stock_count)
+                for (user_id, category_id), (item_count, total_quantity, low_stock_count) in expected.items()
+            ], batch_size=500)
+        return len(expected)
+
+class InventoryVersion(models.Model):
+    # Per-user stamp bumped on every item write, and for everyone on category
+    # writes; the dashboard and reports derive their ETag/Last-Modified from it
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='inventory_version')
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def bump(cls, user_id):
+        now = timezone.now()
+        rows = cls.objects.filter(user_id=user_id)
+        if rows.update(version=F('version') + 1, updated_at=now):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, version=1, updated_at=now)
+        except IntegrityError:
+            rows.update(version=F('version') + 1, updated_at=now)
+
+    @classmethod
+    def bump_all(cls):
+        cls.objects.update(version=F('version') + 1, updated_at=timezone.now())
+
+    @classmethod
+    def current(cls, user_id):
+        """(version, updated_at) for the user, or (None, None) before their first write."""
+        return cls.objects.filter(user_id=user_id).values_list('version', 'updated_at').first() or (None, None)
+
+    @classmethod
+    async def acurrent(cls, user_id):
+        return await cls.objects.filter(user_id=user_id).values_list('version', 'updated_at').afirst() or (None, None)
+
+class StockMovement(models.Model):
+    KIND_CHOICES = [
+        ('RECEIVE', 'Received'),
+        ('ISSUE', 'Issued'),
+        ('ADJUST', 'Adjusted'),
+        ('COUNT', 'Counted'),
+    ]
+
+    # Ledger of quantity changes; InventoryItem.quantity is the running sum of delta
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='movements', db_index=False)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    delta = models.IntegerField()
+    balance = models.IntegerField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    note = models.CharField(max_length=200, blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['item', 'timestamp'], name='stockmovement_item_timestamp'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.delta:+d} {self.item_id}"
+
 class AuditLog(models.Model):
     ACTION_CHOICES = [
         ('CREATE', 'Created'),
@@ -29,11 +297,23 @@ class AuditLog(models.Model):
         ('DELETE', 'Deleted'),
     ]
 
+    # Item, category and user are snapshotted as plain columns so log rows
+    # outlive the item and can be written without loading related objects
     action = models.CharField(max_length=10, choices=ACTION_CHOICES)
-    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
-    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
-    changes = models.TextField()  # JSON or text field to describe changes
+    item_id = models.BigIntegerField()
+    item_name = models.CharField(max_length=200)
+    category_id = models.IntegerField(null=True)
+    category_name = models.CharField(max_length=100, null=True, blank=True)
+    user_id = models.IntegerField(null=True)
+    timestamp = models.DateTimeField(default=timezone.now)  # set when the change happens, not when it is flushed
+    changes = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            # An item's history is always read within its user's log
+            models.Index(fields=['user_id', 'item_id', 'timestamp'], name='auditlog_user_item_timestamp'),
+            models.Index(fields=['user_id', 'timestamp'], name='auditlog_user_timestamp'),
+        ]
 
     def __str__(self):
-        return f"{self.action} - {self.item.name} by {self.user.username if self.user else 'Unknown'}"
+        return f"{self.action} - {self.item_name} by user {self.user_id if self.user_id else 'Unknown'}"
@@ -0,0 +1,155 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    # Full precision, unlike DjangoJSONEncoder, which cuts datetimes to milliseconds
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':'), default=_encode_value).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def key_field(model, path):
+    # The field a lookup path like 'category__parent' ends at; relations give the column they store
+    parts = path.split('__')
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    field = model._meta.get_field(parts[-1])
+    return field.target_field if field.is_relation else field
+
+
+def decode_cursor(cursor, keys, model):
+    """
+    The key values in ``cursor``, converted with each key field's to_python();
+    raises InvalidCursor for anything that is not a cursor these keys produced.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursor(cursor)
+    try:
+        return [
+            None if value is None else key_field(model, key).to_python(value)
+            for key, value in zip(keys, values)
+        ]
+    except (FieldDoesNotExist, TypeError, ValueError, ValidationError):
+        raise InvalidCursor(cursor)
+
+
+def resolve_key(obj, path):
+    # Follows a lookup path like 'category__parent' and returns the raw column
+    # value (the FK id for relations) without loading the final related row.
+    # values() rows carry the key under its lookup name already.
+    if isinstance(obj, dict):
+        return obj[path]
+    parts = path.split('__')
+    for part in parts[:-1]:
+        obj = getattr(obj, part)
+        if obj is None:
+            return None
+    return getattr(obj, obj._meta.get_field(parts[-1]).attname)
+
+
+def _seek_filter(keys, values, forward):
+    # Lexicographic "row comes after/before the cursor" predicate. NULLs are
+    # ordered first so nullable keys (category, parent) seek correctly too.
+    condition = Q(pk__in=[])
+    for position, (key, value) in enumerate(zip(keys, values)):
+        prefix = Q()
+        for prev_key, prev_value in zip(keys[:position], values[:position]):
+            if prev_value is None:
+                prefix &= Q(**{f'{prev_key}__isnull': True})
+            else:
+                prefix &= Q(**{prev_key: prev_value})
+
+        if forward:
+            if value is None:
+                step = Q(**{f'{key}__isnull': False})
+            else:
+                step = Q(**{f'{key}__gt': value})
+        else:
+            if value is None:
+                continue
+            step = Q(**{f'{key}__lt': value}) | Q(**{f'{key}__isnull': True})
+
+        condition |= prefix & step
+    return condition
+
+
+class KeysetPage:
+    def __init__(self, items, keys, has_next, has_previous):
+        self.items = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = None
+        self.previous_cursor = None
+        if items and has_next:
+            self.next_cursor = encode_cursor([resolve_key(items[-1], key) for key in keys])
+        if items and has_previous:
+            self.previous_cursor = encode_cursor([resolve_key(items[0], key) for key in keys])
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def paginate(queryset, keys, page_size, after=None, before=None):
+    """
+    Return one KeysetPage of ``queryset`` ordered by ``keys``.
+
+    ``keys`` is a list of lookup paths whose last entry must be unique (the
+    primary key), so every row has a stable position. Pages are fetched with a
+    seek predicate plus LIMIT, never with OFFSET.
+    """
+    rows, backwards = _page_query(queryset, keys, page_size, after, before)
+    return _page(list(rows), keys, page_size, after, backwards)
+
+
+async def apaginate(queryset, keys, page_size, after=None, before=None):
+    """``paginate`` for async views: the same query, fetched with ``async for``."""
+    rows, backwards = _page_query(queryset, keys, page_size, after, before)
+    return _page([row async for row in rows], keys, page_size, after, backwards)
+
+
+def _page_query(queryset, keys, page_size, after, before):
+    # Returns (sliced queryset, backwards); backwards pages are read in reverse order
+    if before is not None:
+        values = decode_cursor(before, keys, queryset.model)
+        descending = [F(key).desc(nulls_last=True) for key in keys]
+        return queryset.filter(_seek_filter(keys, values, forward=False)).order_by(*descending)[:page_size + 1], True
+
+    if after is not None:
+        values = decode_cursor(after, keys, queryset.model)
+        queryset = queryset.filter(_seek_filter(keys, values, forward=True))
+    ascending = [F(key).asc(nulls_first=True) for key in keys]
+    return queryset.order_by(*ascending)[:page_size + 1], False
+
+
+def _page(rows, keys, page_size, after, backwards):
+    if backwards:
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size]
+        rows.reverse()
+        return KeysetPage(rows, keys, has_next=True, has_previous=has_previous)
+
+    has_next = len(rows) > page_size
+    return KeysetPage(rows[:page_size], keys, has_next=has_next, has_previous=after is not None)
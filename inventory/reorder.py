@@ -0,0 +1,69 @@
+"""
+Reorder levels. Items and categories may set a reorder point, par level and
+reorder quantity; an item without its own value uses the nearest category's,
+and the reorder point falls back to settings.LOW_QUANTITY. The resolved
+reorder point is stored on the item as effective_reorder_point, so every
+low-stock query is one indexed column comparison (models.LOW_STOCK).
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Q
+
+from .category_tree import LEVEL_FIELDS, get_tree
+from .models import InventoryItem
+
+
+def levels(item, tree=None):
+    """{field: value} of the item's own levels, with the unset ones taken from its category."""
+    node = (tree or get_tree()).get(item.category_id) if item.category_id else None
+    result = {}
+    for field in LEVEL_FIELDS:
+        value = getattr(item, field)
+        result[field] = getattr(node, field) if value is None and node is not None else value
+    if result['reorder_point'] is None:
+        result['reorder_point'] = settings.LOW_QUANTITY
+    return result
+
+
+def effective_reorder_point(item, tree=None):
+    return levels(item, tree)['reorder_point']
+
+
+def suggested_order(item, tree=None):
+    """The item's reorder quantity, else what brings it back to its par level; None when neither is set."""
+    item_levels = levels(item, tree)
+    if item_levels['reorder_qty'] is not None:
+        return item_levels['reorder_qty']
+    if item_levels['par_level'] is not None:
+        return max(item_levels['par_level'] - item.quantity, 0)
+    return None
+
+
+def refresh_inherited(category_ids):
+    """
+    Re-resolve effective_reorder_point of the items in ``category_ids`` (None
+    for uncategorized items) that have no reorder point of their own, after a
+    category's defaults, parent or existence changed. One UPDATE per distinct
+    reorder point; returns the ids of the users whose items changed.
+    """
+    tree = get_tree()
+    by_point = defaultdict(list)
+    for category_id in category_ids:
+        node = tree.get(category_id) if category_id else None
+        point = node.reorder_point if node is not None and node.reorder_point is not None else settings.LOW_QUANTITY
+        by_point[point].append(category_id)
+
+    user_ids = set()
+    for point, ids in by_point.items():
+        in_categories = Q(category_id__in=[category_id for category_id in ids if category_id])
+        if None in ids:
+            in_categories |= Q(category__isnull=True)
+        stale = InventoryItem.objects.filter(in_categories, reorder_point__isnull=True).exclude(
+            effective_reorder_point=point
+        )
+        changed = set(stale.values_list('user_id', flat=True).distinct())
+        if changed:
+            stale.update(effective_reorder_point=point)
+            user_ids |= changed
+    return user_ids
@@ -0,0 +1,68 @@
+import re
+
+from django.db import connection
+
+from .models import InventoryItem
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query where every word is a quoted prefix, e.g. '"tomato"* "800g"*'."""
+    return ' '.join(f'"{token}"*' for token in TOKEN.findall(query))
+
+
+def user_match(user, expression):
+    """
+    Restrict an FTS5 query to the user's rows and to the name and category
+    columns. The owner token is part of the MATCH, so FTS5 never visits other
+    users' rows; the owner column gets weight 0 in bm25.
+    """
+    return f'owner : "u{user.pk}" AND {{name category}} : ({expression})'
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def search_ids(user, query, limit=50):
+    """Ids of the user's items matching ``query``, best match first (name hits weigh more than category)."""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    if not fts_available():
+        return list(InventoryItem.objects.filter(user=user, name__icontains=query.strip())
+                    .order_by('name').values_list('id', flat=True)[:limit])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT rowid FROM inventory_item_fts WHERE inventory_item_fts MATCH %s '
+            'ORDER BY bm25(inventory_item_fts, 10.0, 1.0, 0.0) LIMIT %s',
+            [user_match(user, expression), limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_items(user, query, limit=50):
+    ids = search_ids(user, query, limit)
+    items = InventoryItem.objects.filter(pk__in=ids).select_related('category')
+    rank = {id: position for position, id in enumerate(ids)}
+    return sorted(items, key=lambda item: rank[item.pk])
+
+
+def autocomplete(user, query, limit=10):
+    """[{'id', 'name', 'category'}] straight from the FTS table, without touching the item table."""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    if not fts_available():
+        rows = InventoryItem.objects.filter(user=user, name__istartswith=query.strip()).order_by('name').values_list(
+            'id', 'name', 'category__name')[:limit]
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid, name, category FROM inventory_item_fts WHERE inventory_item_fts MATCH %s '
+                'ORDER BY bm25(inventory_item_fts, 10.0, 1.0, 0.0) LIMIT %s',
+                [user_match(user, expression), limit],
+            )
+            rows = cursor.fetchall()
+    return [{'id': id, 'name': name, 'category': category} for id, name, category in rows]
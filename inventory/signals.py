@@ -1,7 +1,29 @@
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from .models import InventoryItem, AuditLog
-import json
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from .models import InventoryItem, Category, CategoryClosure, InventorySummary, InventoryVersion, StockMovement
+from . import audit, category_tree, events, reorder
+
+# Sent with changes=[{'user_id', 'item_id', 'name', 'previous', 'quantity', 'reorder_point'}]
+# by item saves and by the bulk stock paths (inventory.stock, inventory.batch),
+# which bypass post_save
+quantity_changed = Signal()
+
+def item_snapshot(instance):
+    # The category name comes from the cached tree, so a lazy instance.category never costs a query
+    node = category_tree.get_tree().get(instance.category_id) if instance.category_id else None
+    return {
+        'item_id': instance.pk,
+        'item_name': instance.name,
+        'category_id': instance.category_id,
+        'category_name': node.name if node else None,
+        'user_id': instance.user_id,
+    }
+
+@receiver(pre_save, sender=InventoryItem)
+def resolve_reorder_point(sender, instance, **kwargs):
+    # Saves with update_fields must list effective_reorder_point to store it
+    instance.effective_reorder_point = reorder.effective_reorder_point(instance)
 
 @receiver(post_save, sender=InventoryItem)
 def log_inventory_item_change(sender, instance, created, **kwargs):
@@ -9,31 +31,122 @@ def log_inventory_item_change(sender, instance, created, **kwargs):
         action = 'CREATE'
     else:
         action = 'UPDATE'
-    
-    changes = {
-        'name': instance.name,
-        'quantity': instance.quantity,
-        'category': instance.category.name if instance.category else None
-    }
-    
-    AuditLog.objects.create(
-        action=action,
-        item=instance,
-        user=instance.user,
-        changes=json.dumps(changes)
-    )
+
+    changes = instance.changed_fields()
+
+    # Re-saving an unchanged item is not worth an audit row
+    if not created and not changes:
+        return
+
+    audit.record(action=action, changes=changes, **item_snapshot(instance))
 
 @receiver(post_delete, sender=InventoryItem)
 def log_inventory_item_deletion(sender, instance, **kwargs):
-    changes = {
-        'name': instance.name,
-        'quantity': instance.quantity,
-        'category': instance.category.name if instance.category else None
-    }
+    changes = {field: [getattr(instance, field), None] for field in InventoryItem.TRACKED_FIELDS}
+
+    audit.record(action='DELETE', changes=changes, **item_snapshot(instance))
+
+@receiver(post_save, sender=InventoryItem)
+def update_inventory_summary(sender, instance, created, **kwargs):
+    changes = instance.changed_fields(InventoryItem.STATE_FIELDS)
+    old_category, new_category = changes.get('category_id', [instance.category_id] * 2)
+    old_quantity, new_quantity = changes.get('quantity', [instance.quantity] * 2)
+    old_point, new_point = changes.get('effective_reorder_point', [instance.effective_reorder_point] * 2)
+    if old_point is None:
+        # Loaded without the column
+        old_point = new_point
+
+    if not created:
+        if old_category == new_category and old_quantity == new_quantity and old_point == new_point:
+            return
+        InventorySummary.apply(instance.user_id, old_category, item_count=-1, total_quantity=-old_quantity,
+                               low_stock_count=-int(old_quantity <= old_point))
+    InventorySummary.apply(instance.user_id, new_category, item_count=1, total_quantity=new_quantity,
+                           low_stock_count=int(new_quantity <= new_point))
+
+@receiver(post_delete, sender=InventoryItem)
+def remove_from_inventory_summary(sender, instance, **kwargs):
+    InventorySummary.apply(instance.user_id, instance.category_id, item_count=-1, total_quantity=-instance.quantity,
+                           low_stock_count=-int(instance.quantity <= instance.effective_reorder_point))
 
-    AuditLog.objects.create(
-        action='DELETE',
-        item=instance,
-        user=instance.user,
-        changes=json.dumps(changes)
+@receiver(post_save, sender=InventoryItem)
+def record_quantity_in_ledger(sender, instance, created, **kwargs):
+    # Saves that set quantity directly (create, admin, ...) still go into the ledger;
+    # normal quantity changes go through inventory.stock.record_movement instead
+    old_quantity, new_quantity = instance.changed_fields().get('quantity', [instance.quantity] * 2)
+    delta = new_quantity - (old_quantity or 0)
+    if created or delta:
+        StockMovement.objects.create(
+            item=instance, kind='COUNT' if created else 'ADJUST', delta=delta, balance=new_quantity,
+            user_id=instance.user_id, note='Opening balance' if created else '',
+        )
+
+@receiver(post_save, sender=InventoryItem)
+def announce_quantity_change(sender, instance, created, **kwargs):
+    change = instance.changed_fields().get('quantity')
+    if created or change:
+        quantity_changed.send(sender=InventoryItem, changes=[{
+            'user_id': instance.user_id, 'item_id': instance.pk, 'name': instance.name,
+            'previous': None if created else change[0], 'quantity': instance.quantity,
+            'reorder_point': instance.effective_reorder_point,
+        }])
+
+@receiver(quantity_changed)
+def publish_quantity_changes(sender, changes, **kwargs):
+    # Live clients only hear about committed changes
+    transaction.on_commit(lambda: events.publish_changes(changes))
+
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_delete, sender=InventoryItem)
+def bump_inventory_version(sender, instance, **kwargs):
+    InventoryVersion.bump(instance.user_id)
+
+@receiver(post_save, sender=InventoryItem)
+def remember_item_state(sender, instance, **kwargs):
+    # Registered after every handler that reads changed_fields()
+    instance.remember_state()
+
+@receiver(pre_delete, sender=Category)
+def collect_category_summary_users(sender, instance, **kwargs):
+    # Items are moved to "no category" with a bulk UPDATE that sends no signals,
+    # so the affected users' summaries are rebuilt once the category is gone
+    instance._summary_user_ids = list(
+        InventorySummary.objects.filter(category=instance).values_list('user_id', flat=True)
     )
+
+@receiver(post_delete, sender=Category)
+def rebuild_category_summary_users(sender, instance, **kwargs):
+    user_ids = getattr(instance, '_summary_user_ids', None)
+    if user_ids:
+        # The moved items now fall back to the default reorder point
+        reorder.refresh_inherited([None])
+        InventorySummary.rebuild(user_ids)
+
+@receiver(post_save, sender=Category)
+def maintain_category_closure(sender, instance, created, **kwargs):
+    if created or CategoryClosure.parent_changed(instance):
+        CategoryClosure.link(instance)
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    # Drop this process's copy now and bump the shared version once the change
+    # is visible to other processes
+    category_tree.invalidate()
+    transaction.on_commit(category_tree.invalidate)
+
+@receiver(post_save, sender=Category)
+def refresh_inherited_reorder_points(sender, instance, created, **kwargs):
+    # Registered after invalidate_category_tree, so the subtree's inherited levels are current;
+    # a new category has no items yet
+    if created:
+        return
+    user_ids = reorder.refresh_inherited(category_tree.get_tree().subtree_ids(instance.pk))
+    if user_ids:
+        InventorySummary.rebuild(user_ids)
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_all_inventory_versions(sender, **kwargs):
+    # Categories are shared, so every user's pages may show the changed name
+    InventoryVersion.bump_all()
@@ -0,0 +1,190 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import audit
+from .category_tree import get_tree
+from .models import InventoryItem, InventorySummary, InventoryVersion, StockMovement
+from .signals import quantity_changed
+
+
+def category_name(category_id):
+    node = get_tree().get(category_id) if category_id else None
+    return node.name if node else None
+
+
+class QuantityConflict(Exception):
+    """The item's quantity is no longer the one the count was based on."""
+
+    def __init__(self, current):
+        super().__init__(f'quantity is now {current}')
+        self.current = current
+
+
+class NegativeStock(ValueError):
+    """A movement would take items below zero; ``balances`` maps item id to the refused balance."""
+
+    def __init__(self, balances):
+        super().__init__('quantity cannot go below 0: ' + ', '.join(
+            f'item {item_id} would be {balance}' for item_id, balance in sorted(balances.items())))
+        self.balances = balances
+
+
+def record_movement(item, kind, quantity, user=None, note='', expected=None):
+    """
+    Apply one stock movement to ``item`` and return the new balance.
+
+    RECEIVE/ISSUE take a positive quantity, ADJUST a signed delta and COUNT the
+    counted balance. The balance is changed with an ``F('quantity') + delta``
+    UPDATE, so concurrent movements never overwrite each other; a movement
+    that would leave it below zero raises NegativeStock. With
+    ``expected``, QuantityConflict is raised unless the locked quantity is
+    still that value.
+    """
+    # No savepoint: callers that wrap this in their own atomic block roll back as a whole
+    with transaction.atomic(savepoint=False):
+        items = InventoryItem.objects.filter(pk=item.pk)
+        # The row stays locked until commit, so the balance is the locked quantity plus delta
+        row = items.select_for_update().values(
+            'quantity', 'name', 'category_id', 'user_id', 'effective_reorder_point').get()
+        if expected is not None and row['quantity'] != expected:
+            raise QuantityConflict(row['quantity'])
+        if kind == 'COUNT':
+            delta = quantity - row['quantity']
+        elif kind == 'ISSUE':
+            delta = -quantity
+        else:
+            delta = quantity
+
+        balance = row['quantity'] + delta
+        if balance < 0:
+            raise NegativeStock({item.pk: balance})
+        items.update(quantity=F('quantity') + delta)
+        StockMovement.objects.create(
+            item_id=item.pk, kind=kind, delta=delta, balance=balance,
+            user_id=user.pk if user else None, note=note,
+        )
+
+        # update() sends no signals, so keep the summary and audit trail here
+        previous = balance - delta
+        point = row['effective_reorder_point']
+        InventorySummary.apply(row['user_id'], row['category_id'], total_quantity=delta,
+                               low_stock_count=int(balance <= point) - int(previous <= point))
+        InventoryVersion.bump(row['user_id'])
+        if delta:
+            audit.record(
+                action='UPDATE', changes={'quantity': [previous, balance]}, item_id=item.pk,
+                item_name=row['name'], category_id=row['category_id'], category_name=category_name(row['category_id']),
+                user_id=row['user_id'],
+            )
+            quantity_changed.send(sender=InventoryItem, changes=[{
+                'user_id': row['user_id'], 'item_id': item.pk, 'name': row['name'],
+                'previous': previous, 'quantity': balance, 'reorder_point': point,
+            }])
+
+    item.quantity = balance
+    item.remember_state()
+    return balance
+
+
+def reconcile(user_ids=None, dry_run=False):
+    """
+    Recompute balances from the ledger with one grouped aggregate and fix the
+    items whose cached quantity disagrees. Returns [(item, ledger_balance)].
+    """
+    items = InventoryItem.objects.annotate(
+        ledger_balance=Coalesce(Sum('movements__delta'), 0)
+    ).exclude(quantity=F('ledger_balance')).only('id', 'name', 'quantity', 'category_id', 'user_id',
+                                                 'effective_reorder_point')
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    mismatched = [(item, item.ledger_balance) for item in items]
+    if dry_run or not mismatched:
+        return mismatched
+
+    with transaction.atomic():
+        changes = []
+        for item, balance in mismatched:
+            audit.record(
+                action='UPDATE', changes={'quantity': [item.quantity, balance]}, item_id=item.pk,
+                item_name=item.name, category_id=item.category_id, category_name=category_name(item.category_id),
+                user_id=item.user_id,
+            )
+            changes.append({'user_id': item.user_id, 'item_id': item.pk, 'name': item.name,
+                            'previous': item.quantity, 'quantity': balance,
+                            'reorder_point': item.effective_reorder_point})
+            item.quantity = balance
+        InventoryItem.objects.bulk_update([item for item, _ in mismatched], ['quantity'], batch_size=500)
+        quantity_changed.send(sender=InventoryItem, changes=changes)
+        user_ids = {item.user_id for item, _ in mismatched}
+        InventorySummary.rebuild(user_ids)
+        for user_id in user_ids:
+            InventoryVersion.bump(user_id)
+    return mismatched
+
+
+def apply_counts(user, counts, note=''):
+    """
+    Book a stock count for many items at once. ``counts`` maps item id to the
+    counted balance; items not owned by ``user`` are ignored. Everything is
+    written in one transaction: one bulk_update of the balances, one bulk insert
+    each for the ledger and the audit log, and one summary update per category.
+    Returns the updated items.
+    """
+    return _apply_balances(user, counts, lambda item, counted: counted, 'COUNT', note)
+
+
+def apply_deltas(user, deltas, kind='ADJUST', note=''):
+    """
+    Like ``apply_counts``, but ``deltas`` maps item id to a signed quantity
+    change. Raises NegativeStock, writing nothing, if any balance would go below zero.
+    """
+    return _apply_balances(user, deltas, lambda item, delta: item.quantity + delta, kind, note)
+
+
+def _apply_balances(user, values, balance_for, kind, note):
+    with transaction.atomic():
+        items = InventoryItem.objects.select_for_update().filter(user=user, pk__in=list(values)).only(
+            'id', 'name', 'quantity', 'category_id', 'user_id', 'effective_reorder_point'
+        )
+        # Checked against the locked rows before anything is written
+        balances = {item: balance_for(item, values[item.pk]) for item in items}
+        negative = {item.pk: balance for item, balance in balances.items() if balance < 0}
+        if negative:
+            raise NegativeStock(negative)
+
+        now = timezone.now()
+        changed, movements, entries, changes = [], [], [], []
+        summary_deltas = defaultdict(lambda: [0, 0])
+        for item, balance in balances.items():
+            delta = balance - item.quantity
+            if not delta:
+                continue
+            movements.append(StockMovement(item_id=item.pk, kind=kind, delta=delta, balance=balance,
+                                           user_id=user.pk, note=note, timestamp=now))
+            entries.append({
+                'action': 'UPDATE', 'changes': {'quantity': [item.quantity, balance]}, 'item_id': item.pk,
+                'item_name': item.name, 'category_id': item.category_id, 'category_name': category_name(item.category_id),
+                'user_id': item.user_id, 'timestamp': now,
+            })
+            summary_delta = summary_deltas[item.category_id]
+            summary_delta[0] += delta
+            point = item.effective_reorder_point
+            summary_delta[1] += int(balance <= point) - int(item.quantity <= point)
+            changes.append({'user_id': item.user_id, 'item_id': item.pk, 'name': item.name,
+                            'previous': item.quantity, 'quantity': balance, 'reorder_point': point})
+            item.quantity = balance
+            changed.append(item)
+
+        if changed:
+            InventoryItem.objects.bulk_update(changed, ['quantity'], batch_size=500)
+            StockMovement.objects.bulk_create(movements, batch_size=500)
+            audit.write_entries(entries)
+            for category_id, (quantity_delta, low_delta) in summary_deltas.items():
+                InventorySummary.apply(user.pk, category_id, total_quantity=quantity_delta, low_stock_count=low_delta)
+            InventoryVersion.bump(user.pk)
+            quantity_changed.send(sender=InventoryItem, changes=changes)
+    return changed
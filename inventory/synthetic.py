@@ -0,0 +1,121 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from . import audit
+from .batch import create_items
+from .importer import CategoryResolver
+from .models import InventoryItem
+
+# Vocabulary for a hotel-sized storeroom
+DEPARTMENTS = ['Kitchen', 'Bar', 'Housekeeping', 'Minibar', 'Maintenance', 'Laundry', 'Front office', 'Spa']
+SECTIONS = ['Dry goods', 'Chilled', 'Frozen', 'Cleaning', 'Linen', 'Spirits', 'Wine', 'Amenities', 'Spare parts',
+            'Stationery', 'Beverages', 'Disposables']
+LOCATIONS = ['Aisle', 'Shelf', 'Bin', 'Rack']
+PRODUCTS = ['tomato paste', 'olive oil', 'basmati rice', 'espresso beans', 'sparkling water', 'gin', 'tonic water',
+            'bath towel', 'pillowcase', 'shampoo', 'shower gel', 'toilet roll', 'glass cleaner', 'dish tablets',
+            'light bulb', 'AA battery', 'printer paper', 'napkins', 'orange juice', 'butter', 'flour', 'sugar sachets',
+            'red wine', 'lager', 'peanuts', 'chocolate bar', 'slippers', 'bathrobe', 'laundry detergent', 'fabric softener']
+VARIANTS = ['', 'organic', 'premium', 'house', 'low-fat', 'large', 'small', 'eco']
+SIZES = ['200g', '500g', '800g', '1kg', '5kg', '330ml', '750ml', '1L', '5L', 'x12', 'x24', 'single']
+
+
+def numbered(words, count):
+    # words[0], words[1], ... then "words[0] 2", "words[1] 2", ... once the vocabulary runs out
+    return [words[n % len(words)] + (f' {n // len(words) + 1}' if n >= len(words) else '') for n in range(count)]
+
+
+def category_paths(roots, depth, fanout):
+    """Leaf paths of a tree with ``roots`` departments, ``fanout`` children per node and ``depth`` levels."""
+    paths = [(name,) for name in numbered(DEPARTMENTS, roots)]
+    for level in range(1, depth):
+        if level == 1:
+            names = numbered(SECTIONS, fanout)
+        else:
+            names = [f'{LOCATIONS[(level - 2) % len(LOCATIONS)]} {n}' for n in range(1, fanout + 1)]
+        paths = [path + (name,) for path in paths for name in names]
+    return paths
+
+
+def item_name(rng):
+    variant = rng.choice(VARIANTS)
+    return ' '.join(part for part in (variant, rng.choice(PRODUCTS), rng.choice(SIZES)) if part).capitalize()
+
+
+def item_quantity(rng):
+    # Roughly one item in ten at or below the low-stock threshold
+    if rng.random() < 0.1:
+        return rng.randint(0, settings.LOW_QUANTITY)
+    return rng.randint(settings.LOW_QUANTITY + 1, 200)
+
+
+def generate(users=10, depth=3, roots=6, fanout=4, items=1000, audit_rows=1000, prefix='bench', password='bench',
+             seed=0, log=None):
+    """
+    Create ``users`` users named ``<prefix>0001``... (reusing existing ones),
+    a shared category tree, ``items`` items per user spread over its leaves
+    (with ledger, audit and summary rows via ``batch.create_items``) and
+    ``audit_rows`` extra UPDATE audit entries per user over the last 180 days.
+    Returns counts of what was created.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    chunk_size = settings.IMPORT_CHUNK_SIZE
+
+    resolver = CategoryResolver()
+    paths = category_paths(roots, depth, fanout)
+    before = resolver.created
+    resolver.create_missing(set(paths))
+    leaves = [resolver.lookup(path) for path in paths]
+    log(f'{len(leaves)} leaf categories ({resolver.created - before} new categories)')
+
+    password_hash = make_password(password)
+    existing = set(User.objects.filter(username__startswith=prefix).values_list('username', flat=True))
+    names = [f'{prefix}{n:04}' for n in range(1, users + 1)]
+    User.objects.bulk_create([User(username=name, password=password_hash) for name in names if name not in existing])
+    owners = list(User.objects.filter(username__in=names).order_by('username'))
+
+    created_items = created_audit = 0
+    now = timezone.now()
+    for owner in owners:
+        remaining = items
+        while remaining:
+            count = min(chunk_size, remaining)
+            create_items(owner, [
+                InventoryItem(name=item_name(rng), quantity=item_quantity(rng),
+                              category_id=rng.choice(leaves) if rng.random() > 0.05 else None, user=owner)
+                for _ in range(count)
+            ], note='Generated', category_names=resolver.names)
+            remaining -= count
+        created_items += items
+
+        item_rows = list(InventoryItem.objects.filter(user=owner).values_list('id', 'name', 'category_id'))
+        remaining = audit_rows if item_rows else 0
+        while remaining:
+            count = min(chunk_size, remaining)
+            entries = []
+            for _ in range(count):
+                item_id, name, category_id = rng.choice(item_rows)
+                old = item_quantity(rng)
+                entries.append({
+                    'action': 'UPDATE', 'item_id': item_id, 'item_name': name,
+                    'category_id': category_id, 'category_name': resolver.names.get(category_id), 'user_id': owner.pk,
+                    'timestamp': now - timedelta(seconds=rng.randint(0, 180 * 24 * 3600)),
+                    'changes': {'quantity': [old, max(0, old + rng.randint(-10, 10))]},
+                })
+            audit.write_entries(entries)
+            remaining -= count
+            created_audit += count
+        log(f'{owner.username}: {items} items, {audit_rows} audit rows')
+
+    return {
+        'users': len(owners),
+        'categories': len(resolver.names),
+        'leaf_categories': len(leaves),
+        'items': created_items,
+        'audit_rows': created_audit,
+    }
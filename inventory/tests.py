@@ -1,3 +1,622 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from base64 import b64encode
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory_management.settings import LOW_QUANTITY
+from . import api, audit, benchmarks, metrics
+from .budgets import BudgetExceeded, profile_requests
+from .category_tree import get_tree
+from .events import broker, publish_changes
+from .exporter import audit_rows
+from .forms import CategoryForm
+from .fragments import CSRF_PLACEHOLDER, fragment_cache
+from .importer import import_items
+from .models import LOW_STOCK, AuditLog, Category, CategoryClosure, InventoryItem, InventorySummary, StockMovement
+from .pagination import encode_cursor
+from .search import autocomplete, search_ids
+from .stock import NegativeStock, apply_counts, apply_deltas, reconcile, record_movement
+from .synthetic import generate
+from .views import Dashboard
+
+
+class QueryPlanTests(TestCase):
+    """
+    The queries the dashboard, reports, search and audit views actually run
+    must be served by an index, not a table scan; each test EXPLAINs the SQL
+    captured from a request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='storekeeper', password='secret')
+        InventoryItem.objects.create(name='tomato paste', quantity=1, user=cls.user)
+
+    def setUp(self):
+        self.client.login(username='storekeeper', password='secret')
+        fragment_cache().clear()
+
+    def captured(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def statements(self, url, params=None, table='inventory_inventoryitem', contains=''):
+        """The SELECTs from ``table`` that a GET of ``url`` runs."""
+        statements = [sql for sql in self.captured(url, params)
+                      if sql.startswith('SELECT') and re.search(rf'FROM "?{table}\b', sql) and contains in sql]
+        self.assertTrue(statements)
+        return statements
+
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, statements, *index_names, sorted_by_index=True):
+        for sql in statements:
+            plan = self.query_plan(sql)
+            table_step = plan[0]
+            self.assertTrue(any(name in table_step for name in index_names), plan)
+            if sorted_by_index:
+                self.assertFalse(any('TEMP B-TREE' in step for step in plan), plan)
+
+    def dashboard_page(self, sort_by, cursor=None):
+        params = {'sort': sort_by}
+        if cursor is not None:
+            params['after'] = encode_cursor(cursor)
+        return self.statements(reverse('dashboard'), params, contains='ORDER BY')
+
+    def test_dashboard_sorts_use_user_indexes(self):
+        self.assertUsesIndex(self.dashboard_page('name'), 'item_user_name')
+        self.assertUsesIndex(self.dashboard_page('quantity'), 'item_user_quantity')
+        self.assertUsesIndex(self.dashboard_page('category'), 'item_user_category')
+
+    def test_dashboard_next_page_seeks_index(self):
+        self.assertUsesIndex(self.dashboard_page('name', cursor=['tomato paste', 42]), 'item_user_name')
+        self.assertUsesIndex(self.dashboard_page('quantity', cursor=[7, 42]), 'item_user_quantity')
+
+    def test_dashboard_low_stock_count_uses_index(self):
+        low_count = self.statements(reverse('dashboard'), contains='COUNT(')
+        self.assertUsesIndex(low_count, 'item_user_low_stock')
+
+    def test_low_stock_report_uses_index(self):
+        self.assertUsesIndex(self.statements(reverse('low-stock')), 'item_user_low_stock')
+
+    def test_summary_report_uses_index(self):
+        summary = self.statements(reverse('inventory-summary'), table='inventory_inventorysummary')
+        self.assertUsesIndex(summary, 'inventorysummary_user', 'inventory_summary_unique')
+
+    def test_search_uses_fts_index(self):
+        search = self.statements(reverse('search'), {'q': 'tom'}, table='inventory_item_fts')
+        self.assertUsesIndex(search, 'VIRTUAL TABLE INDEX', sorted_by_index=False)
+        items = self.statements(reverse('search'), {'q': 'tom'})
+        self.assertUsesIndex(items, 'INTEGER PRIMARY KEY', sorted_by_index=False)
+
+    def test_item_history_uses_index(self):
+        history = self.statements(reverse('api-audit-log'), {'item': 42}, table='inventory_auditlog')
+        self.assertUsesIndex(history, 'auditlog_user_item_timestamp')
+        log = self.statements(reverse('api-audit-log'), table='inventory_auditlog')
+        self.assertUsesIndex(log, 'auditlog_user_timestamp')
+
+
+class SearchTests(TestCase):
+    """The FTS index follows item and category writes, including bulk ones that send no signals."""
+
+    def test_index_tracks_writes(self):
+        user = User.objects.create_user(username='storekeeper', password='secret')
+        canned = Category.objects.create(name='Canned goods')
+        paste = InventoryItem.objects.create(name='Tomato paste 800g', quantity=4, category=canned, user=user)
+        InventoryItem.objects.bulk_create([InventoryItem(name='Chopped tomatoes', quantity=1, user=user)])
+
+        self.assertEqual(search_ids(user, 'tom past 800')[0], paste.pk)
+        self.assertEqual(len(search_ids(user, 'tom')), 2)
+
+        canned.name = 'Tins'
+        canned.save()
+        self.assertEqual(autocomplete(user, 'tin'), [{'id': paste.pk, 'name': 'Tomato paste 800g', 'category': 'Tins'}])
+
+        paste.delete()
+        self.assertEqual(search_ids(user, 'paste'), [])
+
+    def test_users_sharing_a_term_only_match_their_own_items(self):
+        user, other = (User.objects.create_user(username=name, password='secret') for name in ('storekeeper', 'chef'))
+        paste = InventoryItem.objects.create(name='Tomato paste', quantity=4, user=user)
+        InventoryItem.objects.bulk_create([InventoryItem(name=f'Tomato {n}', quantity=1, user=other) for n in range(20)])
+
+        self.assertEqual(search_ids(user, 'tomato', limit=5), [paste.pk])
+        self.assertEqual(len(search_ids(other, 'tomato', limit=5)), 5)
+        self.assertEqual([row['id'] for row in autocomplete(user, 'tom')], [paste.pk])
+        # The owner token is not searchable as text
+        self.assertEqual(search_ids(user, f'u{user.pk}'), [])
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='storekeeper', password='secret')
+        cls.items = [InventoryItem.objects.create(name=f'item {n}', quantity=n, user=cls.user) for n in range(5)]
+
+    def setUp(self):
+        self.client.login(username='storekeeper', password='secret')
+
+    def test_keyset_pages_with_projection(self):
+        seen, after = [], None
+        while True:
+            params = {'sort': 'quantity', 'limit': 2, 'fields': 'id,quantity'}
+            if after:
+                params['after'] = after
+            body = self.client.get(reverse('api-items'), params).json()
+            self.assertTrue(all(set(row) == {'id', 'quantity'} for row in body['results']))
+            seen.extend(row['id'] for row in body['results'])
+            after = body['next']
+            if not after:
+                break
+        self.assertEqual(seen, [item.pk for item in self.items])
+
+    def test_tampered_cursor_is_rejected(self):
+        tampered = encode_cursor(['x', 1])
+        response = self.client.get(reverse('api-items'), {'sort': 'quantity', 'after': tampered})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api-audit-log'), {'after': encode_cursor(['yesterday', 1])})
+        self.assertEqual(response.status_code, 400)
+        # The dashboard falls back to the first page
+        response = self.client.get(reverse('dashboard'), {'sort': 'quantity', 'after': tampered})
+        self.assertEqual(response.status_code, 200)
+
+    def test_batch_is_all_or_nothing(self):
+        batch = {
+            'create': [{'name': 'tomato paste', 'quantity': 6}],
+            'update': [{'id': self.items[0].pk, 'name': 'renamed', 'quantity': 10}],
+            'adjust': [{'id': self.items[1].pk, 'delta': -1}],
+        }
+        response = self.client.post(reverse('api-items-batch'), batch, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        quantities = {row['id']: row['quantity'] for row in response.json()['items']}
+        self.assertEqual(quantities[self.items[0].pk], 10)
+        self.assertEqual(quantities[self.items[1].pk], 0)
+
+        batch['adjust'].append({'id': 10 ** 6, 'delta': 1})
+        response = self.client.post(reverse('api-items-batch'), batch, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(InventoryItem.objects.filter(name='tomato paste').count(), 1)
+
+    def test_negative_quantity_is_rejected_like_the_form(self):
+        batch = {'create': [{'name': 'tomato paste', 'quantity': -1}]}
+        response = self.client.post(reverse('api-items-batch'), batch, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['error'],
+                         'quantity: Ensure this value is greater than or equal to 0.')
+
+    def test_adjust_below_zero_rejects_the_batch(self):
+        batch = {'update': [{'id': self.items[1].pk, 'name': 'renamed'}],
+                 'adjust': [{'id': self.items[2].pk, 'delta': -1}, {'id': self.items[1].pk, 'delta': -2}]}
+        response = self.client.post(reverse('api-items-batch'), batch, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'],
+                         [{'section': 'adjust', 'index': 1, 'error': 'quantity would be -1, below 0'}])
+        self.assertEqual(list(InventoryItem.objects.filter(pk__in=[self.items[1].pk, self.items[2].pk])
+                              .order_by('pk').values_list('name', 'quantity')), [('item 1', 1), ('item 2', 2)])
+
+    def test_basic_auth_is_checked_once(self):
+        self.client.logout()
+        header = 'Basic ' + b64encode(b'storekeeper:secret').decode()
+        with mock.patch('inventory.api.authenticate', wraps=api.authenticate) as authenticate:
+            for _ in range(3):
+                self.assertEqual(self.client.get(reverse('api-items'), HTTP_AUTHORIZATION=header).status_code, 200)
+            self.assertEqual(authenticate.call_count, 1)
+            self.user.set_password('changed')
+            self.user.save()
+            self.assertEqual(self.client.get(reverse('api-items'), HTTP_AUTHORIZATION=header).status_code, 401)
+
+
+class AuditSpoolTests(TestCase):
+    def test_replay_skips_spools_of_running_processes(self):
+        entry = {'action': 'CREATE', 'item_id': 7, 'item_name': 'tomato paste', 'user_id': None,
+                 'timestamp': '2026-10-18T07:00:00+00:00', 'changes': {}}
+        with tempfile.TemporaryDirectory() as directory:
+            Path(directory, '1.jsonl').write_text(json.dumps(entry) + '\n')
+            running = audit.AuditBuffer(batch_size=100, flush_interval=60, spool_dir=directory)
+            running.add([dict(entry, item_id=8, timestamp=timezone.now())])
+
+            self.assertEqual(audit.replay_spool(directory), 1)
+            self.assertEqual([path.name for path in Path(directory).iterdir()], [running.spool_path.name])
+            running.flush()
+            self.assertEqual(list(Path(directory).iterdir()), [])
+        self.assertEqual(sorted(AuditLog.objects.values_list('item_id', flat=True)), [7, 8])
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='storekeeper', password='secret')
+
+    def test_rows_are_validated_like_the_item_form(self):
+        result = import_items([
+            {'name': 'tomato paste', 'quantity': '4', 'category': 'Food > Canned'},
+            {'name': 'passata', 'quantity': '3.0'},
+            {'name': 'olive oil', 'quantity': '-2'},
+            {'name': 'basil'},
+            {'name': '', 'quantity': 1},
+            'not a row',
+        ], self.user)
+
+        self.assertEqual((result.created, result.skipped), (2, 4))
+        self.assertEqual(result.errors, [
+            'row 3: quantity: Ensure this value is greater than or equal to 0.',
+            'row 4: quantity: This field is required.',
+            'row 5: missing or too long name',
+            'row 6: not a JSON object',
+        ])
+        self.assertEqual(dict(InventoryItem.objects.values_list('name', 'quantity')), {'tomato paste': 4, 'passata': 3})
+        self.assertEqual(get_tree().get(InventoryItem.objects.get(name='tomato paste').category_id).path, 'Food › Canned')
+
+    def test_unreadable_upload_is_a_form_error(self):
+        self.client.login(username='storekeeper', password='secret')
+        upload = SimpleUploadedFile('items.csv', 'name,quantity\ncrème,1\n'.encode('latin-1'))
+
+        response = self.client.post(reverse('import-items'), {'file': upload})
+        self.assertContains(response, 'could not be read as UTF-8 CSV')
+        self.assertFalse(InventoryItem.objects.exists())
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        self.food = Category.objects.create(name='Food')
+        self.dairy = Category.objects.create(name='Dairy', parent=self.food)
+        self.cheese = Category.objects.create(name='Cheese', parent=self.dairy)
+        self.hard = Category.objects.create(name='Hard', parent=self.cheese)
+        self.pets = Category.objects.create(name='Pets')
+
+    def links(self, category):
+        """(ancestor, depth) pairs of ``category``'s closure rows, by name."""
+        rows = CategoryClosure.objects.filter(descendant=category).values_list('ancestor__name', 'depth')
+        return sorted(rows, key=lambda row: row[1])
+
+    def move(self, category, parent):
+        category.parent = parent
+        category.save()
+
+    def test_reparenting_moves_the_whole_subtree(self):
+        self.move(self.dairy, self.pets)
+        self.assertEqual(self.links(self.hard), [('Hard', 0), ('Cheese', 1), ('Dairy', 2), ('Pets', 3)])
+        self.assertEqual(self.links(self.dairy), [('Dairy', 0), ('Pets', 1)])
+        self.assertEqual(set(self.pets.descendants(include_self=False)), {self.dairy, self.cheese, self.hard})
+        self.assertEqual(list(self.food.descendants()), [self.food])
+        self.assertEqual(list(self.hard.ancestors()), [self.pets, self.dairy, self.cheese])
+        self.assertEqual(set(get_tree().subtree_ids(self.pets.pk)), {self.pets.pk, self.dairy.pk, self.cheese.pk, self.hard.pk})
+
+        self.move(self.cheese, None)
+        self.assertEqual(self.links(self.hard), [('Hard', 0), ('Cheese', 1)])
+        self.assertEqual(list(self.cheese.ancestors()), [])
+        self.assertEqual(set(self.pets.descendants()), {self.pets, self.dairy})
+        self.assertEqual(CategoryClosure.objects.count(), 7)
+
+    def test_category_cannot_move_below_its_subtree(self):
+        before = set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        for parent in (self.dairy, self.hard):
+            form = CategoryForm({'name': 'Dairy', 'parent': parent.pk}, instance=self.dairy)
+            self.assertEqual(form.errors['parent'], ['A category cannot be placed under its own subcategory.'])
+        self.assertEqual(set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')), before)
+
+
+class ExportTests(TestCase):
+    def test_audit_export_filters_on_the_category_not_its_name(self):
+        user = User.objects.create_user(username='storekeeper', password='secret')
+        food, pets = Category.objects.create(name='Food'), Category.objects.create(name='Pets')
+        with self.captureOnCommitCallbacks(execute=True):
+            milk = InventoryItem.objects.create(name='milk', quantity=4, user=user,
+                                                category=Category.objects.create(name='Dairy', parent=food))
+            InventoryItem.objects.create(name='cat milk', quantity=4, user=user,
+                                         category=Category.objects.create(name='Dairy', parent=pets))
+        audit.flush()
+
+        self.assertEqual([row[3] for row in audit_rows(user, category_id=food.pk)], [milk.pk])
+
+
+class ConditionalGetTests(TestCase):
+    def test_unchanged_dashboard_is_not_modified(self):
+        user = User.objects.create_user(username='storekeeper', password='secret')
+        item = InventoryItem.objects.create(name='tomato paste', quantity=5, user=user)
+        self.client.login(username='storekeeper', password='secret')
+        etag = self.client.get(reverse('dashboard'))['ETag']
+
+        # Session, user and version stamp; no item queries
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        item.name = 'passata'
+        item.save()
+        self.assertEqual(self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_new_session_is_not_served_a_stale_page(self):
+        user = User.objects.create_user(username='storekeeper', password='secret')
+        InventoryItem.objects.create(name='tomato paste', quantity=50, user=user)
+        self.client.login(username='storekeeper', password='secret')
+        etag = self.client.get(reverse('dashboard'))['ETag']
+        self.client.logout()
+        self.client.login(username='storekeeper', password='secret')
+
+        response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # A flash message queued elsewhere is shown instead of answering 304
+        self.client.post(reverse('daily-count'))
+        response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Saved 0 counts')
+
+    def test_repeat_dashboard_is_served_from_fragment_cache(self):
+        user = User.objects.create_user(username='storekeeper', password='secret')
+        InventoryItem.objects.create(name='tomato paste', quantity=5, user=user)
+        self.client.login(username='storekeeper', password='secret')
+        self.client.get(reverse('dashboard'))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'tomato paste')
+        self.assertNotContains(response, CSRF_PLACEHOLDER)
+
+
+class EventTests(TestCase):
+    def test_low_stock_transitions_reach_subscribers(self):
+        async def receive():
+            with broker.subscribe(user_id=1) as subscription:
+                publish_changes([
+                    {'user_id': 1, 'item_id': 7, 'name': 'tomato paste', 'previous': 12, 'quantity': 10,
+                     'reorder_point': 10},
+                    {'user_id': 2, 'item_id': 8, 'name': 'passata', 'previous': 5, 'quantity': 0, 'reorder_point': 3},
+                ])
+                await asyncio.sleep(0)
+                return [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+
+        events = asyncio.run(receive())
+        self.assertEqual([kind for _, kind, _ in events], ['quantity', 'low_stock'])
+        self.assertTrue(events[1][2]['low'])
+        self.assertEqual(broker.subscriber_count(), 0)
+
+    @override_settings(ASYNC_VIEWS=True)
+    def test_wsgi_requests_do_not_stream(self):
+        User.objects.create_user(username='storekeeper', password='secret')
+        self.client.login(username='storekeeper', password='secret')
+        self.assertNotContains(self.client.get(reverse('dashboard')), 'EventSource')
+        response = self.client.get(reverse('events'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+
+class StockTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='storekeeper', password='secret')
+
+    def test_refresh_after_a_movement_is_not_an_edit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = InventoryItem.objects.create(name='tomato paste', quantity=5, user=self.user)
+            record_movement(InventoryItem.objects.get(pk=item.pk), 'RECEIVE', 4, user=self.user)
+            item.refresh_from_db()
+            item.name = 'passata'
+            item.save()
+        audit.flush()
+
+        changes = [log.changes for log in AuditLog.objects.filter(item_id=item.pk, action='UPDATE').order_by('id')]
+        self.assertEqual(changes, [{'quantity': [5, 9]}, {'name': ['tomato paste', 'passata']}])
+        self.assertEqual(reconcile(), [])
+        self.assertEqual(InventorySummary.drift(), {})
+
+    def test_stale_edit_form_does_not_undo_a_movement(self):
+        canned = Category.objects.create(name='Canned goods')
+        item = InventoryItem.objects.create(name='tomato paste', quantity=5, category=canned, user=self.user)
+        self.client.login(username='storekeeper', password='secret')
+        self.assertContains(self.client.get(reverse('edit-item', args=[item.pk])), 'name="original_quantity" value="5"')
+        record_movement(item, 'RECEIVE', 4, user=self.user)
+
+        edit = {'name': 'tomato paste', 'quantity': 6, 'original_quantity': 5, 'category': canned.pk}
+        response = self.client.post(reverse('edit-item', args=[item.pk]), edit)
+        self.assertContains(response, 'changed from 5 to 9', status_code=409)
+        self.assertContains(response, 'name="original_quantity" value="9"', status_code=409)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 9)
+
+        # Unchanged quantity: the other fields are saved, the movement stands
+        response = self.client.post(reverse('edit-item', args=[item.pk]), dict(edit, name='passata', quantity=5))
+        self.assertEqual(response.status_code, 302)
+        item.refresh_from_db()
+        self.assertEqual((item.name, item.quantity), ('passata', 9))
+
+    def test_issue_cannot_take_stock_below_zero(self):
+        item = InventoryItem.objects.create(name='tomato paste', quantity=3, user=self.user)
+        with self.assertRaises(NegativeStock), transaction.atomic():
+            record_movement(item, 'ISSUE', 4, user=self.user)
+        self.assertEqual(record_movement(item, 'ISSUE', 3, user=self.user), 0)
+        balances = StockMovement.objects.filter(item_id=item.pk).order_by('id').values_list('balance', flat=True)
+        self.assertEqual(list(balances), [3, 0])
+
+    def test_ledger_sums_to_quantity_after_mixed_movements(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            flour, rice = (InventoryItem.objects.create(name=name, quantity=10, user=self.user) for name in ('flour', 'rice'))
+            record_movement(flour, 'RECEIVE', 5, user=self.user)
+            apply_counts(self.user, {flour.pk: 12, rice.pk: 10})
+            apply_deltas(self.user, {flour.pk: -4, rice.pk: 3})
+            record_movement(rice, 'ISSUE', 13, user=self.user)
+            record_movement(flour, 'COUNT', 9, user=self.user)
+        audit.flush()
+
+        ledger = {item_id: sum(StockMovement.objects.filter(item_id=item_id).values_list('delta', flat=True))
+                  for item_id in (flour.pk, rice.pk)}
+        self.assertEqual(ledger, dict(InventoryItem.objects.values_list('id', 'quantity')))
+        self.assertEqual(ledger, {flour.pk: 9, rice.pk: 0})
+        # The unchanged rice count is not booked; the first COUNT is the opening balance
+        kinds = StockMovement.objects.filter(item_id=rice.pk).order_by('id').values_list('kind', flat=True)
+        self.assertEqual(list(kinds), ['COUNT', 'ADJUST', 'ISSUE'])
+        self.assertEqual(reconcile(), [])
+        self.assertEqual(InventorySummary.drift(), {})
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        flour = InventoryItem.objects.create(name='flour', quantity=10, user=self.user)
+        InventoryItem.objects.create(name='rice', quantity=4, user=self.user)
+        # Changed behind the ledger's back, as a raw UPDATE would
+        InventoryItem.objects.filter(pk=flour.pk).update(quantity=7)
+
+        self.assertEqual([(item.pk, item.quantity, balance) for item, balance in reconcile(dry_run=True)],
+                         [(flour.pk, 7, 10)])
+        flour.refresh_from_db()
+        self.assertEqual(flour.quantity, 7)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual([item.pk for item, _ in reconcile()], [flour.pk])
+        audit.flush()
+        flour.refresh_from_db()
+        self.assertEqual(flour.quantity, 10)
+        self.assertEqual(reconcile(dry_run=True), [])
+        self.assertEqual(InventorySummary.drift(), {})
+        self.assertEqual(AuditLog.objects.filter(item_id=flour.pk, action='UPDATE').get().changes, {'quantity': [7, 10]})
+
+
+class ReorderTests(TestCase):
+    def test_items_inherit_category_reorder_points(self):
+        user = User.objects.create_user(username='storekeeper', password='secret')
+        food = Category.objects.create(name='Food', reorder_point=10, reorder_qty=24)
+        dairy = Category.objects.create(name='Dairy', parent=food)
+        milk = InventoryItem.objects.create(name='milk', quantity=8, category=dairy, user=user)
+        InventoryItem.objects.create(name='butter', quantity=8, category=dairy, reorder_point=5, user=user)
+        InventoryItem.objects.create(name='rice', quantity=LOW_QUANTITY, user=user)
+
+        self.client.login(username='storekeeper', password='secret')
+        response = self.client.get(reverse('low-stock'))
+        self.assertEqual([item.name for item, _ in response.context['rows']], ['milk', 'rice'])
+        self.assertEqual([order for _, order in response.context['rows']], [24, None])
+
+        food.reorder_point = 6
+        food.save()
+        milk.refresh_from_db()
+        self.assertEqual(milk.effective_reorder_point, 6)
+        self.assertEqual(InventoryItem.objects.filter(LOW_STOCK).get().name, 'rice')
+        self.assertEqual(InventorySummary.drift(), {})
+
+
+class BenchmarkTests(TestCase):
+    def test_generated_data_benchmarks_and_compares(self):
+        counts = generate(users=2, depth=2, roots=2, fanout=3, items=20, audit_rows=10)
+        self.assertEqual(counts, {'users': 2, 'categories': 8, 'leaf_categories': 6, 'items': 40, 'audit_rows': 20})
+        self.assertEqual(AuditLog.objects.count(), 60)
+
+        user = User.objects.get(username='bench0001')
+        results = benchmarks.run(user, repeat=1, warmup=0)
+        self.assertEqual(len([name for name in results if name.startswith('dashboard-')]), len(Dashboard.SORT_KEYS) + 1)
+        self.assertTrue({'inventory-summary', 'low-stock', 'items-by-category', 'edit-item', 'delete-item'} <= set(results))
+        self.assertEqual(InventoryItem.objects.filter(user=user).count(), 20)  # writes were rolled back
+
+        slower = {name: {**stats, 'queries': stats['queries'] + 1} for name, stats in results.items()}
+        self.assertEqual(benchmarks.compare(results, results), [])
+        self.assertEqual(len(benchmarks.compare(results, slower)), len(results))
+
+
+class BudgetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='storekeeper', password='secret')
+        self.client.login(username='storekeeper', password='secret')
+
+    def test_dashboard_queries_do_not_grow_with_items(self):
+        dairy = Category.objects.create(name='Dairy', parent=Category.objects.create(name='Food'))
+        # Rebuilding the category tree after the writes is one query, whatever the item count
+        get_tree()
+        counts = []
+        for total in (1, 120):
+            InventoryItem.objects.bulk_create([
+                InventoryItem(name=f'item {n}', quantity=n % 5, category=dairy, user=self.user)
+                for n in range(total - InventoryItem.objects.count())
+            ])
+            with profile_requests() as profiles:
+                self.client.get(reverse('dashboard'), {'sort': 'subcategory'})
+                self.client.get(reverse('low-stock'))
+            counts.append([profile.count for profile in profiles])
+        self.assertEqual(counts[0], counts[1])
+
+    def test_count_edit_does_not_save_the_item(self):
+        dairy = Category.objects.create(name='Dairy')
+        item = InventoryItem.objects.create(name='milk', quantity=4, category=dairy, user=self.user)
+        get_tree()
+        # Session, user, item and category check; the view's savepoint; then the
+        # locked read, quantity update, movement, summary and version stamp
+        with self.assertNumQueries(11):
+            self.client.post(reverse('edit-item', args=[item.pk]),
+                             {'name': 'milk', 'quantity': 6, 'original_quantity': 4, 'category': dairy.pk})
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 6)
+        self.assertEqual(InventorySummary.objects.get(user=self.user, category=dairy).total_quantity, 6)
+
+    @override_settings(REQUEST_BUDGETS={'low-stock': {'queries': 3}})
+    def test_violation_reports_offending_query(self):
+        with self.assertRaisesMessage(BudgetExceeded, 'queries 4 > 3'):
+            self.client.get(reverse('low-stock'))
+
+
+class ServerTimingTests(TestCase):
+    @override_settings(SERVER_TIMING=True, SLOW_REQUEST_MS=0)
+    def test_timing_header_and_slow_request_log(self):
+        user = User.objects.create_user(username='storekeeper', password='secret')
+        InventoryItem.objects.create(name='tomato paste', quantity=1, user=user)
+        self.client.login(username='storekeeper', password='secret')
+        with self.assertLogs('inventory.timing', 'WARNING') as logs:
+            response = self.client.get(reverse('low-stock'))
+
+        metrics = [metric.split(';')[0] for metric in response['Server-Timing'].split(', ')]
+        self.assertEqual(metrics, ['db', 'render', 'session', 'total'])
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['url_name'], line['user_id']), ('low-stock', user.pk))
+        self.assertEqual(sum(query['count'] for query in line['top_queries']), line['queries'])
+
+
+class MetricsTests(TestCase):
+    def test_endpoint_reports_requests_changes_and_low_stock(self):
+        user = User.objects.create_user(username='storekeeper', password='secret')
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryItem.objects.create(name='tomato paste', quantity=LOW_QUANTITY, user=user)
+        audit.flush()
+        self.client.login(username='storekeeper', password='secret')
+        self.client.get(reverse('dashboard'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+
+        with override_settings(METRICS_TOKEN='scrape'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape')
+        self.assertContains(response, 'inventory_request_duration_seconds_count{method="GET",view="dashboard"}')
+        self.assertContains(response, 'inventory_requests_total{method="GET",status="2xx",view="dashboard"}')
+        self.assertContains(response, 'inventory_item_changes_total{action="create"}')
+        self.assertContains(response, 'inventory_low_stock_items 1.0')
+        self.assertNotContains(response, 'storekeeper')
+
+    def test_worker_files_are_summed(self):
+        registry = metrics.Registry()
+        requests = registry.counter('requests_total', 'Requests.', ['view'])
+        connections = registry.gauge('connections_open', 'Open connections.')
+        # A worker that has exited: its counters still count, its gauges do not
+        dead_pid = int(subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                      capture_output=True, text=True).stdout)
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            requests.inc(view='dashboard')
+            connections.inc()
+            worker = metrics.MmapFile(f'{directory}/metrics-{dead_pid}.db')
+            worker.add(requests.key('', (('view', 'dashboard'),)), 2)
+            worker.add(connections.key('', ()), 5)
+            with mock.patch('os.kill', wraps=os.kill) as kill:
+                exposed = registry.expose()
+        self.assertIn('requests_total{view="dashboard"} 3.0', exposed)
+        self.assertIn('connections_open 1.0', exposed)
+        # A scrape never signals its own process (on Windows os.kill would terminate it)
+        self.assertNotIn(mock.call(os.getpid(), 0), kill.call_args_list)
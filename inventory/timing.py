@@ -0,0 +1,145 @@
+"""
+Request timing for the inventory views. ServerTimingMiddleware adds a
+Server-Timing header (db, render, session, total) when
+settings.SERVER_TIMING is on, and writes one JSON line with the slowest SQL
+statements for requests slower than settings.SLOW_REQUEST_MS. With both
+off the middleware removes itself from the chain.
+"""
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack, ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.functional import SimpleLazyObject, empty
+
+from .instrumentation import ProfilingMiddleware, QueryTimer, RenderTimer, SessionTimer, url_match
+
+logger = logging.getLogger(__name__)
+
+SQL_LOG_LENGTH = 1000
+
+
+class StatementTimer(QueryTimer):
+    """QueryTimer that also counts and times each distinct SQL statement."""
+
+    def __init__(self):
+        super().__init__()
+        self.statements = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            statement = self.statements[sql]
+            statement[0] += 1
+            statement[1] += elapsed
+
+    def top(self, limit):
+        ranked = sorted(self.statements.items(), key=lambda statement: statement[1][1], reverse=True)
+        return [
+            {'sql': sql[:SQL_LOG_LENGTH], 'count': count, 'ms': round(duration * 1000, 2)}
+            for sql, (count, duration) in ranked[:limit]
+        ]
+
+
+class RequestTiming:
+    """Times the queries, template renders and session access of a request, and the request itself."""
+
+    def __init__(self, url_name, keep_statements=False):
+        self.url_name = url_name
+        self.queries = StatementTimer() if keep_statements else QueryTimer()
+        self.renders = RenderTimer()
+        self.sessions = SessionTimer()
+        self.duration = 0.0
+        self._stack = None
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    def __enter__(self):
+        with ExitStack() as stack:
+            for timer in (self.queries, self.renders, self.sessions):
+                stack.enter_context(timer)
+            self._stack = stack.pop_all()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self._started
+        return self._stack.__exit__(*exc_info)
+
+    async def __aenter__(self):
+        async with AsyncExitStack() as stack:
+            await stack.enter_async_context(self.queries)
+            stack.enter_context(self.renders)
+            stack.enter_context(self.sessions)
+            self._stack = stack.pop_all()
+        self._started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.duration = time.perf_counter() - self._started
+        return await self._stack.__aexit__(*exc_info)
+
+    def header(self):
+        return ', '.join([
+            f'db;dur={self.queries.duration_ms:.1f};desc="{self.queries.count} queries"',
+            f'render;dur={self.renders.duration_ms:.1f}',
+            f'session;dur={self.sessions.duration_ms:.1f}',
+            f'total;dur={self.duration_ms:.1f}',
+        ])
+
+
+class ServerTimingMiddleware(ProfilingMiddleware):
+    def __init__(self, get_response):
+        self.header = settings.SERVER_TIMING
+        self.slow_ms = settings.SLOW_REQUEST_MS
+        if not self.header and self.slow_ms is None:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def profile(self, request):
+        match = url_match(request)
+        if match is None or not match.func.__module__.startswith('inventory.'):
+            return None
+        return RequestTiming(match.url_name, keep_statements=self.slow_ms is not None)
+
+    def finish(self, request, response, timing):
+        if self.header:
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = f'{existing}, {timing.header()}' if existing else timing.header()
+        if self.slow_ms is not None and timing.duration_ms >= self.slow_ms:
+            self.log_slow_request(request, response, timing)
+        return response
+
+    def log_slow_request(self, request, response, timing):
+        logger.warning(json.dumps({
+            'event': 'slow_request',
+            'method': request.method,
+            'path': request.get_full_path(),
+            'url_name': timing.url_name,
+            'status': response.status_code,
+            'user_id': loaded_user_id(request),
+            'total_ms': round(timing.duration_ms, 2),
+            'db_ms': round(timing.queries.duration_ms, 2),
+            'queries': timing.queries.count,
+            'render_ms': round(timing.renders.duration_ms, 2),
+            'session_ms': round(timing.sessions.duration_ms, 2),
+            'top_queries': timing.queries.top(settings.SLOW_REQUEST_TOP_QUERIES),
+        }))
+
+
+def loaded_user_id(request):
+    # Only a user the view already loaded; evaluating request.user here would query, even from async code
+    user = getattr(request, 'user', None)
+    if isinstance(user, SimpleLazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    return user.pk if user is not None and user.is_authenticated else None
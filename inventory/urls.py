@@ -1,6 +1,11 @@
+from django.conf import settings
 from django.urls import path
-from .views import Index, SignUpView, Dashboard, AddItem, EditItem, DeleteItem, InventorySummaryReport, LowStockReport, ItemsByCategoryView
+from .views import Index, SignUpView, Dashboard, AddItem, EditItem, DailyCount, ImportItems, DeleteItem, InventorySummaryReport, LowStockReport, ItemsByCategoryView, SearchItems, ItemAutocomplete, ItemEvents, Metrics, ExportItems, ExportAuditLog
 from django.contrib.auth import views as auth_views
+from .api import ItemList, ItemDetail, ItemBatch, CategoryList, AuditLogList
+
+if settings.ASYNC_VIEWS:
+    from .async_views import AsyncDashboard as Dashboard, AsyncInventorySummaryReport as InventorySummaryReport, AsyncLowStockReport as LowStockReport, AsyncItemsByCategoryView as ItemsByCategoryView
 
 urlpatterns = [
     path('', Index.as_view(), name='index'),
@@ -8,11 +13,24 @@ urlpatterns = [
     path('add-item/', AddItem.as_view(), name='add-item'),
     path('edit-item/<int:item_id>/', EditItem.as_view(), name='edit-item'),
     path('delete-item/<int:pk>', DeleteItem.as_view(), name='delete-item'),
+    path('daily-count/', DailyCount.as_view(), name='daily-count'),
+    path('import-items/', ImportItems.as_view(), name='import-items'),
     path('signup/', SignUpView.as_view(), name='signup'),
     path('login/', auth_views.LoginView.as_view(template_name='inventory/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(template_name='inventory/logout.html'), name='logout'),
     path('inventory-summary/', InventorySummaryReport.as_view(), name='inventory-summary'),
     path('low-stock/', LowStockReport.as_view(), name='low-stock'),
     path('items-by-category/<int:category_id>/', ItemsByCategoryView.as_view(), name='items-by-category'),
+    path('search/', SearchItems.as_view(), name='search'),
+    path('search/autocomplete/', ItemAutocomplete.as_view(), name='search-autocomplete'),
+    path('events/', ItemEvents.as_view(), name='events'),
+    path('metrics', Metrics.as_view(), name='metrics'),
+    path('export/items/', ExportItems.as_view(), name='export-items'),
+    path('export/audit-log/', ExportAuditLog.as_view(), name='export-audit-log'),
+    path('api/items/', ItemList.as_view(), name='api-items'),
+    path('api/items/batch/', ItemBatch.as_view(), name='api-items-batch'),
+    path('api/items/<int:item_id>/', ItemDetail.as_view(), name='api-item'),
+    path('api/categories/', CategoryList.as_view(), name='api-categories'),
+    path('api/audit-log/', AuditLogList.as_view(), name='api-audit-log'),
             ]
 
@@ -1,50 +1,153 @@
+import csv
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.dateparse import parse_date
 from django.urls import reverse_lazy, reverse
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.views.generic import TemplateView, View, CreateView, UpdateView, DeleteView, ListView
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.mixins import LoginRequiredMixin
-from .forms import UserRegisterForm, InventoryItemForm
-from .models import InventoryItem, Category
-from inventory_management.settings import LOW_QUANTITY
+from .category_tree import get_tree
+from . import events, metrics
+from .fragments import CSRF_PLACEHOLDER, cached_fragment, fragment_key, with_csrf_token
+from .forms import UserRegisterForm, InventoryItemForm, EditItemForm, ImportItemsForm
+from .exporter import AUDIT_COLUMNS, ITEM_COLUMNS, audit_rows, item_rows, stream_csv, stream_jsonl
+from .importer import guess_format, import_items, read_rows, text_stream
+from .models import LOW_STOCK, InventoryItem, Category, InventorySummary, InventoryVersion
+from .pagination import InvalidCursor, paginate
+from .reorder import suggested_order
+from .search import autocomplete, search_items
+from .instrumentation import QueryTimer
+from .stock import QuantityConflict, apply_counts, record_movement
+from inventory_management.settings import DASHBOARD_PAGE_SIZE, DASHBOARD_MAX_PAGE_SIZE, DAILY_COUNT_PAGE_SIZE
+from django.conf import settings
 from django.contrib import messages
-from django.db import models  # Import models her
-from django.db.models import Sum, Count, F
+from django.db import models, transaction  # Import models her
+from django.db.models import Sum, Count, F, Q, BooleanField, ExpressionWrapper
+
+def inventory_version(request):
+    # Memoized so the ETag and Last-Modified callbacks share one lookup
+    if not hasattr(request, '_inventory_version'):
+        request._inventory_version = InventoryVersion.current(request.user.pk)
+    return request._inventory_version
+
+def has_pending_messages(request):
+    # len() loads the storage without marking the messages as shown
+    return bool(len(messages.get_messages(request)))
+
+def inventory_etag(request, *args, **kwargs):
+    version, _ = inventory_version(request)
+    if version is None or has_pending_messages(request):
+        return None
+    # A cached page embeds the CSRF token, so it is only valid for the session
+    # and token it was rendered with; logging in again rotates both
+    get_token(request)
+    client = salted_hmac('inventory.views.etag', f"{request.META['CSRF_COOKIE']}:{request.session.session_key}")
+    return f'{request.user.pk}-{version}-{client.hexdigest()[:16]}'
+
+def inventory_last_modified(request, *args, **kwargs):
+    return None if has_pending_messages(request) else inventory_version(request)[1]
+
+# Pages that only change with the user's items or the categories answer a
+# revalidation with 304 before any item query or template rendering
+inventory_conditions = [
+    cache_control(private=True, no_cache=True),
+    condition(etag_func=inventory_etag, last_modified_func=inventory_last_modified),
+]
+conditional_on_inventory = method_decorator(inventory_conditions, name='get')
 
 class Index(TemplateView):
 	template_name= 'inventory/index.html'
 
+@conditional_on_inventory
 class Dashboard(LoginRequiredMixin, View):
-    def get(self, request):
+    # Keyset columns per sort option; 'id' is always last as the tiebreaker
+    SORT_KEYS = {
+        'id': ['id'],
+        'name': ['name', 'id'],
+        'quantity': ['quantity', 'id'],
+        'category': ['category', 'id'],
+        'subcategory': ['category__parent', 'category', 'name', 'id'],
+    }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.GET.get('page_size', DASHBOARD_PAGE_SIZE))
+        except ValueError:
+            return DASHBOARD_PAGE_SIZE
+        return max(1, min(page_size, DASHBOARD_MAX_PAGE_SIZE))
+
+    def page_params(self, request):
         sort_by = request.GET.get('sort', 'category')  # Default sorting by 'category'
 
         # Validate the sort_by parameter
-        if sort_by not in ['id', 'category', 'subcategory', 'name', 'quantity']:
+        if sort_by not in self.SORT_KEYS:
             sort_by = 'category'  # Default to 'category' if invalid sort_by parameter
 
-        # Fetch items with their categories and subcategories
-        items = InventoryItem.objects.filter(user=request.user.id).select_related('category__parent')
+        return sort_by, self.get_page_size(request), request.GET.get('after'), request.GET.get('before')
 
-        # Sort the items based on the selected option
-        if sort_by == 'subcategory':
-            items = items.order_by('category__parent', 'category', 'name')
-        else:
-            items = items.order_by(sort_by)
-        
-        low_inventory = InventoryItem.objects.filter(user=request.user.id, quantity__lte=LOW_QUANTITY)
-        low_inventory_ids = []
+    def cache_key(self, request, *params):
+        # Rendered rows, cursors and low-stock count are cached per inventory version;
+        # a repeat view runs no item query and renders no rows
+        version, updated_at = inventory_version(request)
+        if version is None:
+            return None
+        return fragment_key('dashboard-rows', request.user.pk, version, updated_at, *params)
+
+    def get(self, request):
+        params = self.page_params(request)
+        fragment = cached_fragment(self.cache_key(request, *params), lambda: self.render_rows(request, *params))
+        return self.render_page(request, fragment, *params[:2])
+
+    @staticmethod
+    def items(user_id):
+        # Items with their categories and subcategories, flagging low stock in the same query
+        return InventoryItem.objects.filter(user=user_id).select_related('category__parent').annotate(
+            is_low=ExpressionWrapper(LOW_STOCK, output_field=BooleanField())
+        )
+
+    @staticmethod
+    def low_count(user_id):
+        # Counted from the partial low-stock index alone
+        return InventoryItem.objects.filter(LOW_STOCK, user=user_id).count()
+
+    @staticmethod
+    def fragment(page, low_count):
+        rows = render_to_string('inventory/dashboard_rows.html', {'items': page.items, 'csrf_token': CSRF_PLACEHOLDER})
+        return {
+            'rows': rows,
+            'page': {'next_cursor': page.next_cursor, 'previous_cursor': page.previous_cursor},
+            'low_count': low_count,
+        }
 
-        if low_inventory.count() > 0:
-            if low_inventory.count() > 1:
-                messages.error(request, f'{low_inventory.count()} items have low inventory')
-            else:
-                messages.error(request, f'{low_inventory.count()} item has low inventory')
+    def render_rows(self, request, sort_by, page_size, after, before):
+        # Fetch a single page after/before the cursor, sorted by the selected option
+        items = self.items(request.user.id)
+        try:
+            page = paginate(items, self.SORT_KEYS[sort_by], page_size, after=after, before=before)
+        except InvalidCursor:
+            page = paginate(items, self.SORT_KEYS[sort_by], page_size)
+        return self.fragment(page, self.low_count(request.user.id))
 
-            low_inventory_ids = low_inventory.values_list('id', flat=True)
+    def render_page(self, request, fragment, sort_by, page_size):
+        low_count = fragment['low_count']
+        if low_count > 1:
+            messages.error(request, f'{low_count} items have low inventory')
+        elif low_count == 1:
+            messages.error(request, f'{low_count} item has low inventory')
 
         return render(request, 'inventory/dashboard.html', {
-            'items': items,
-            'low_inventory_ids': low_inventory_ids,
-            'sort_by': sort_by
+            'rows': with_csrf_token(request, fragment['rows']),
+            'page': fragment['page'],
+            'page_size': page_size,
+            'sort_by': sort_by,
+            'live_events': events.available(request),
         })
 
 class SignUpView(View):
@@ -75,7 +178,7 @@ class AddItem(LoginRequiredMixin, CreateView):
 
 	def get_context_data(self, **kwargs):
 		context = super().get_context_data(**kwargs)
-		context['categories'] = Category.objects.all()
+		context['categories'] = get_tree().ordered
 		return context
 
 	def form_valid(self, form):
@@ -85,33 +188,125 @@ class AddItem(LoginRequiredMixin, CreateView):
 class EditItem(LoginRequiredMixin, View):
     def get(self, request, item_id):
         item = get_object_or_404(InventoryItem, id=item_id, user=request.user)
-        form = InventoryItemForm(instance=item)
+        form = EditItemForm(instance=item)
         return render(request, 'inventory/edit_item.html', {'form': form, 'item': item})
 
     def post(self, request, item_id):
         item = get_object_or_404(InventoryItem, id=item_id, user=request.user)
-        form = InventoryItemForm(request.POST, instance=item)
+        form = EditItemForm(request.POST, instance=item)
         if form.is_valid():
-            form.save()
+            # Name and category are saved from the form; a changed quantity is
+            # booked as a stock count, unless a movement changed the quantity
+            # after the form was opened
+            counted, shown = form.cleaned_data['quantity'], form.cleaned_data['original_quantity']
+            try:
+                with transaction.atomic():
+                    item = form.save(commit=False)
+                    item.quantity = form.initial['quantity']
+                    if any(field != 'quantity' for field in item.changed_fields()):
+                        item.save(update_fields=['name', 'category', 'reorder_point', 'par_level', 'reorder_qty',
+                                                 'effective_reorder_point'])
+                    if counted != shown:
+                        record_movement(item, 'COUNT', counted, user=request.user, expected=shown)
+            except QuantityConflict as conflict:
+                # Resubmitting counts against the current quantity
+                form.data = form.data.copy()
+                form.data['original_quantity'] = conflict.current
+                form.add_error('quantity', f'The quantity changed from {shown} to {conflict.current} '
+                                           f'since this form was opened. Save again to count it as {counted}.')
+                return render(request, 'inventory/edit_item.html', {'form': form, 'item': item}, status=409)
             next_url = request.GET.get('next', 'dashboard')
             return redirect(next_url)
         return render(request, 'inventory/edit_item.html', {'form': form, 'item': item})
 
 
+class DailyCount(LoginRequiredMixin, View):
+    # One grid per page of items, ordered by name; every changed quantity is saved in one request
+    def get(self, request):
+        items = InventoryItem.objects.filter(user=request.user).only('id', 'name', 'quantity', 'category_id')
+        try:
+            page = paginate(items, ['name', 'id'], DAILY_COUNT_PAGE_SIZE,
+                            after=request.GET.get('after'), before=request.GET.get('before'))
+        except InvalidCursor:
+            page = paginate(items, ['name', 'id'], DAILY_COUNT_PAGE_SIZE)
+
+        tree = get_tree()
+        rows = [(item, tree.get(item.category_id)) for item in page]
+        return render(request, 'inventory/daily_count.html', {'rows': rows, 'page': page})
+
+    def post(self, request):
+        counts = {}
+        invalid = 0
+        for key, value in request.POST.items():
+            if not key.startswith('qty-') or value == request.POST.get('orig-' + key[4:]):
+                continue
+            try:
+                item_id, counted = int(key[4:]), int(value)
+            except ValueError:
+                invalid += 1
+                continue
+            if counted < 0:
+                invalid += 1
+                continue
+            counts[item_id] = counted
+
+        with QueryTimer() as timer:
+            changed = apply_counts(request.user, counts) if counts else []
+
+        messages.success(request, f'Saved {len(changed)} counts ({timer.count} queries, {timer.duration_ms:.1f} ms DB time)')
+        if invalid:
+            messages.error(request, f'{invalid} quantities were not whole numbers of zero or more and were skipped')
+        return redirect(f"{reverse('daily-count')}?{request.GET.urlencode()}")
+
+
+class ImportItems(LoginRequiredMixin, View):
+    def get(self, request):
+        return render(request, 'inventory/import_items.html', {'form': ImportItemsForm()})
+
+    def post(self, request):
+        form = ImportItemsForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(request, 'inventory/import_items.html', {'form': form})
+
+        upload = form.cleaned_data['file']
+        format = form.cleaned_data['format'] or guess_format(upload.name)
+        try:
+            result = import_items(read_rows(text_stream(upload.file), format), request.user)
+        except (UnicodeDecodeError, csv.Error) as error:
+            # Rows are imported chunk by chunk, so the chunks read before the error are kept
+            form.add_error('file', f'The file could not be read as UTF-8 {format.upper()}: {error}. The import '
+                                   f'stopped there; earlier chunks of {settings.IMPORT_CHUNK_SIZE} rows were saved.')
+            return render(request, 'inventory/import_items.html', {'form': form})
+
+        messages.success(request, f'Imported {result.created} items in {result.seconds:.2f}s ({result.rows_per_second:.0f} rows/sec)')
+        if result.skipped:
+            messages.error(request, f'{result.skipped} rows skipped: ' + '; '.join(result.errors))
+        return redirect('dashboard')
+
+
 class DeleteItem(LoginRequiredMixin, View):
     def post(self, request, pk):
         item = get_object_or_404(InventoryItem, pk=pk, user=self.request.user)
         item.delete()
         return redirect('dashboard')
 
+@conditional_on_inventory
 class InventorySummaryReport(LoginRequiredMixin, View):
     def get(self, request):
-        items = InventoryItem.objects.filter(user=self.request.user)
-        total_items = items.count()
-        total_quantity = items.aggregate(Sum('quantity'))['quantity__sum'] or 0
-
-        # Get the count of items per category
-        category_counts = Category.objects.filter(inventoryitem__user=self.request.user).annotate(item_count=Count('inventoryitem')).values('id', 'name', 'item_count')
+        # One read of the per-category counters kept by the item signals
+        rows = InventorySummary.objects.filter(user=self.request.user, item_count__gt=0).values_list(
+            'category_id', 'item_count', 'total_quantity'
+        )
+        tree = get_tree()
+        total_items = 0
+        total_quantity = 0
+        category_counts = []
+        for category_id, item_count, quantity in rows:
+            total_items += item_count
+            total_quantity += quantity
+            node = tree.get(category_id)
+            if node is not None:
+                category_counts.append({'id': category_id, 'name': node.name, 'item_count': item_count})
 
         context = {
             'total_items': total_items,
@@ -121,14 +316,111 @@ class InventorySummaryReport(LoginRequiredMixin, View):
         return render(request, 'inventory/inventory_summary_report.html', context)
 
 
+@conditional_on_inventory
 class LowStockReport(LoginRequiredMixin, View):
     def get(self, request):
-        low_stock_items = InventoryItem.objects.filter(user=self.request.user, quantity__lte=LOW_QUANTITY)
+        low_stock_items = InventoryItem.objects.filter(LOW_STOCK, user=self.request.user).select_related('category')
+        tree = get_tree()
         context = {
-            'low_stock_items': low_stock_items,
+            'rows': [(item, suggested_order(item, tree)) for item in low_stock_items],
         }
         return render(request, 'inventory/low_stock_report.html', context)
 
+class SearchItems(LoginRequiredMixin, View):
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        context = {
+            'query': query,
+            'items': search_items(request.user, query) if query else [],
+        }
+        return render(request, 'inventory/search.html', context)
+
+
+class ItemAutocomplete(LoginRequiredMixin, View):
+    # Prefix matches from the FTS index, best first: {"results": [{"id", "name", "category"}]}
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        return JsonResponse({'results': autocomplete(request.user, query) if query else []})
+
+class ItemEvents(View):
+    # Server-Sent Events with the user's quantity changes and low-stock transitions.
+    # Async end to end, so under ASGI an idle client holds a queue, not a thread.
+    async def get(self, request):
+        if not events.available(request):
+            # EventSource clients stop reconnecting on 204; the page still updates on reload
+            return HttpResponse(status=204)
+        user = await request.auser()
+        if not user.is_authenticated:
+            return HttpResponse('Authentication required', status=401)
+        response = StreamingHttpResponse(events.stream(user.pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+class Metrics(View):
+    # Prometheus scrape target: the scraper sends METRICS_TOKEN as a bearer token; staff may look too
+    def get(self, request):
+        token = settings.METRICS_TOKEN
+        scraper = token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+        if not (scraper or request.user.is_staff):
+            return HttpResponse('Authentication required', status=401)
+        return HttpResponse(metrics.registry.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+class ExportView(LoginRequiredMixin, View):
+    # Streams rows straight from a values_list iterator; ?format=csv|jsonl&category=<id>&from=&to=
+    columns = None
+    filename = None
+
+    def rows(self, user, **filters):
+        raise NotImplementedError
+
+    @staticmethod
+    def parse_day(value):
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        return day
+
+    def get(self, request):
+        format = request.GET.get('format', 'csv')
+        if format not in ('csv', 'jsonl'):
+            return HttpResponseBadRequest('format must be csv or jsonl')
+        try:
+            filters = {
+                'category_id': int(request.GET['category']) if request.GET.get('category') else None,
+                'date_from': self.parse_day(request.GET.get('from')),
+                'date_to': self.parse_day(request.GET.get('to')),
+            }
+        except ValueError:
+            return HttpResponseBadRequest('category must be an id and from/to dates must be YYYY-MM-DD')
+
+        rows = self.rows(request.user, **filters)
+        if format == 'csv':
+            response = StreamingHttpResponse(stream_csv(self.columns, rows), content_type='text/csv; charset=utf-8')
+        else:
+            response = StreamingHttpResponse(stream_jsonl(self.columns, rows), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.{format}"'
+        return response
+
+
+class ExportItems(ExportView):
+    columns = ITEM_COLUMNS
+    filename = 'inventory'
+
+    def rows(self, user, **filters):
+        return item_rows(user, **filters)
+
+
+class ExportAuditLog(ExportView):
+    columns = AUDIT_COLUMNS
+    filename = 'audit-log'
+
+    def rows(self, user, **filters):
+        return audit_rows(user, **filters)
+
+
 def category_list(request):
     categories = Category.objects.filter(parent__isnull=True)
     return render(request, 'category_list.html', {'categories': categories})       
@@ -136,10 +428,22 @@ def category_list(request):
 class ItemsByCategoryView(LoginRequiredMixin, View):
     def get(self, request, category_id):
         category = get_object_or_404(Category, id=category_id)
-        items = InventoryItem.objects.filter(category=category, user=self.request.user)
-        
+
+        # Items anywhere below the category, via a single join on the closure table
+        items = InventoryItem.objects.filter(
+            category__ancestor_links__ancestor=category, user=self.request.user
+        ).select_related('category').order_by('name')
+
+        # Rollups for each direct subcategory's whole subtree in one grouped query
+        user_items = Q(descendant_links__descendant__inventoryitem__user=self.request.user)
+        subcategories = Category.objects.filter(parent=category).annotate(
+            item_count=Count('descendant_links__descendant__inventoryitem', filter=user_items),
+            total_quantity=Sum('descendant_links__descendant__inventoryitem__quantity', filter=user_items),
+        ).order_by('name')
+
         context = {
             'category': category,
             'items': items,
+            'subcategories': subcategories,
         }
-        return render(request, 'inventory/items_by_category.html', context)
\ No newline at end of file
+        return render(request, 'inventory/items_by_category.html', context)
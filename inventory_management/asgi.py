@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
+
+Serve with an ASGI server (e.g. ``uvicorn inventory_management.asgi:application``)
+so the /events/ streams wait on the event loop instead of holding a thread each,
+and the dashboard and reports run their async variants (settings.ASYNC_VIEWS).
+Events are published in-process, so run a single worker process per host or
+expect each client to see only the writes handled by its own worker.
 """
 
 import os
@@ -12,5 +18,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventory_management.settings')
+os.environ.setdefault('INVENTORY_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
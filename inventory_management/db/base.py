@@ -0,0 +1,46 @@
+"""
+SQLite backend that reports connection and write-lock metrics.
+
+Connection tuning is plain Django configuration (DATABASES[...]['OPTIONS']
+``init_command`` and ``transaction_mode``, see settings.py); this subclass
+only reports connections opened and open, the time BEGIN waits for the write
+lock and the transactions that gave up waiting, to inventory.metrics.
+"""
+import time
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+from inventory import metrics
+
+if django.VERSION < (5, 1):
+    # Older versions pass init_command/transaction_mode on to sqlite3.connect() and fail there
+    raise ImproperlyConfigured(f'inventory_management.db needs Django 5.1 or later (see requirements.txt), found {django.get_version()}.')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        metrics.DB_CONNECTIONS_OPENED.inc()
+        metrics.DB_CONNECTIONS_OPEN.inc()
+        return conn
+
+    def _close(self):
+        if self.connection is not None:
+            metrics.DB_CONNECTIONS_OPEN.dec()
+        return super()._close()
+
+    def _start_transaction_under_autocommit(self):
+        # busy_timeout makes BEGIN IMMEDIATE wait here while another connection holds the write lock
+        started = time.perf_counter()
+        try:
+            super()._start_transaction_under_autocommit()
+        except OperationalError as e:
+            if 'locked' in str(e):
+                metrics.DB_LOCK_TIMEOUTS.inc()
+            raise
+        finally:
+            metrics.DB_LOCK_WAIT.observe(time.perf_counter() - started)
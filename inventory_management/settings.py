@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,7 +44,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventory.timing.ServerTimingMiddleware',
+    'inventory.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'inventory.budgets.RequestBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -76,14 +80,55 @@ WSGI_APPLICATION = 'inventory_management.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# SQLite with WAL and tuned pragmas, run on every new connection. IMMEDIATE
+# makes atomic blocks take the write lock up front instead of upgrading a read
+# lock later, which is what fails with "database is locked". Both options need
+# Django 5.1+, pinned in requirements.txt and checked by the custom engine.
+# The custom engine only adds connection and lock-wait metrics.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # in KiB when negative, i.e. 64 MB
+    'mmap_size': 268435456,  # 256 MB
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,  # ms
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'inventory_management.db',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name} = {value}' for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
 
+# 'default' holds small state every worker must see: the category tree version,
+# which each process compares to drop its in-memory tree after another process
+# changed a category, and API auth checks. It must be shared between workers,
+# so never locmem; with several hosts use
+#   'django.core.cache.backends.redis.RedisCache' with LOCATION 'redis://127.0.0.1:6379/1' (needs redis-py).
+# 'fragments' holds rendered HTML keyed by the user's inventory version, which
+# the item and category signals bump, so a write retires the old entries and
+# they age out; it is correct per process, and sharing it only saves renders.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'default',
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'inventory-fragments',
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+FRAGMENT_CACHE = 'fragments'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -131,4 +176,64 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 LOGIN_REDIRECT_URL = '/dashboard'
 LOGIN_URL = 'login'
 
-LOW_QUANTITY = 3
\ No newline at end of file
+LOW_QUANTITY = 3
+
+DASHBOARD_PAGE_SIZE = 50
+DASHBOARD_MAX_PAGE_SIZE = 500
+DAILY_COUNT_PAGE_SIZE = 200
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+API_MAX_BATCH_SIZE = 1000
+# How long a successful HTTP Basic check is remembered, so repeat calls skip the password hash
+API_AUTH_CACHE_SECONDS = 60
+
+# Serve the dashboard and reports with their async variants (inventory/async_views.py).
+# asgi.py turns this on; under WSGI every async view would need its own event loop.
+ASYNC_VIEWS = os.environ.get('INVENTORY_ASYNC_VIEWS') == '1'
+
+# Server-Sent Events (/events/, served only under ASGI with ASYNC_VIEWS; 204 otherwise)
+EVENTS_QUEUE_SIZE = 100  # per client; the oldest events are dropped beyond this
+EVENTS_KEEPALIVE = 15  # seconds between keepalive comments
+EVENTS_RETRY_MS = 5000  # client reconnect delay
+
+# Most SQL queries, DB time and template render time (ms) one request to each URL name
+# may use, checked by inventory.budgets.RequestBudgetMiddleware. Query counts include
+# the session and user lookups (and a category tree reload after a category change)
+# and must not grow with the number of items.
+REQUEST_BUDGETS = {
+    'dashboard': {'queries': 5, 'db_ms': 100, 'render_ms': 250},
+    'inventory-summary': {'queries': 6, 'db_ms': 100, 'render_ms': 250},
+    'low-stock': {'queries': 5},
+    'items-by-category': {'queries': 5},
+    'edit-item': {'queries': 13},
+    'delete-item': {'queries': 8},
+    'search': {'queries': 4},
+    'search-autocomplete': {'queries': 3},
+}
+# Raise inventory.budgets.BudgetExceeded instead of logging; the test runner turns this on
+REQUEST_BUDGETS_RAISE = False
+TEST_RUNNER = 'inventory.budgets.BudgetTestRunner'
+
+# Server-Timing header (db, render, session, total) on responses from the inventory
+# views, and a JSON log line with the slowest SQL statements for requests slower than
+# SLOW_REQUEST_MS (None turns it off). With both off the middleware is skipped entirely,
+# so both are opt-in: it times every request and captures its SQL while on.
+SERVER_TIMING = DEBUG
+SLOW_REQUEST_MS = None  # e.g. 1000
+SLOW_REQUEST_TOP_QUERIES = 5
+
+# Metrics served at /metrics (inventory/metrics.py). Without METRICS_DIR each process
+# counts on its own; with several gunicorn workers point it at a directory they share
+# (cleared at server start) so any worker's /metrics covers all of them.
+METRICS_ENABLED = True
+METRICS_DIR = os.environ.get('INVENTORY_METRICS_DIR')
+METRICS_TOKEN = os.environ.get('INVENTORY_METRICS_TOKEN')  # bearer token for the scraper; otherwise staff only
+
+# Audit log writes: 'sync' inserts each AuditLog row inside the signal handler,
+# 'batched' buffers rows after commit and flushes them with bulk_create.
+AUDIT_LOG_MODE = 'batched'
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL = 2  # seconds
+AUDIT_SPOOL_DIR = BASE_DIR / 'audit_spool'